@@ -0,0 +1,158 @@
+import hashlib
+import random
+
+from . import helpers
+from .helpers import eprint
+
+MASK = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+
+def mix64(z):
+    '''
+    splitmix64 finalizer
+    '''
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+    return z ^ (z >> 31)
+
+def stream_key(*parts):
+    '''
+    64 bit key of a stream eg. (seed, table, column)
+    '''
+    data = ':'.join([str(p) for p in parts]).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+class CounterRandom(random.Random):
+    '''
+    counter based random : the n-th draw of a stream is mix64(key + n * golden),
+    so any (key, row) stream can be started without generating the ones before it.
+    can be used in place of faker's random
+    '''
+    def __init__(self, key=0):
+        self.key = key
+        self.counter = 0
+        super().__init__(key)
+
+    def seed(self, a=None, version=2):
+        self.key = stream_key(a) if a is not None else 0
+        self.counter = 0
+
+    def reset(self, key, row):
+        self.key = mix64((key + (row + 1) * GOLDEN) & MASK)
+        self.counter = 0
+
+    def next64(self):
+        self.counter += 1
+        return mix64((self.key + self.counter * GOLDEN) & MASK)
+
+    def random(self):
+        return (self.next64() >> 11) * (1.0 / 9007199254740992.0)
+
+    def getrandbits(self, k):
+        if k <= 0:
+            return 0
+        if k <= 64:
+            return self.next64() >> (64 - k)
+        value = 0
+        bits = 0
+        while bits < k:
+            value = (value << 64) | self.next64()
+            bits += 64
+        return value >> (bits - k)
+
+    def getstate(self):
+        return (self.key, self.counter)
+
+    def setstate(self, state):
+        self.key, self.counter = state
+
+class AddressableGenerator:
+    '''
+    every cell is a pure function of (seed, table, column, row) : any row range can be
+    generated on its own and foreign keys are derived from a random parent row, without a cache.
+    unique constraints/options are not enforced (except for sequences)
+    '''
+    def __init__(self, config, numrows, seed=0):
+        self.config = config
+        # table -> no.of rows, to pick the parent rows of foreign keys
+        self.numrows = numrows
+        self.seed = seed
+        self.rng = CounterRandom()
+        self.specs = {}
+        self.warned = set()
+
+    def spec(self, tablename, colname):
+        key = (tablename, colname)
+        if key in self.specs:
+            return self.specs[key]
+
+        colcfg = self.config.get_column(tablename, colname)
+        spec = {
+            'key' : stream_key(self.seed, tablename, colname),
+            'null' : colcfg.get('null_fraction', 0) or 0,
+            'kind' : 'gen',
+        }
+        generator = colcfg['generator']
+        if generator == 'sequence':
+            spec['kind'] = 'sequence'
+            spec['start'] = colcfg.get('start', 1)
+            spec['step'] = colcfg.get('step', 1)
+        elif generator == 'foreign':
+            spec['kind'] = 'foreign'
+            spec['parent'] = colcfg['key'].split('.')
+        else:
+            coldata = dict(colcfg)
+            # the distinct cap of stats is stateful, left out
+            coldata.pop('n_distinct', None)
+            spec['fn'] = self.config.build_generator(tablename, coldata, wrap=False)
+            if 'distinct' in colcfg:
+                spec['kind'] = 'distinct'
+                spec['distinct'] = int(colcfg['distinct'])
+                spec['distinct_key'] = stream_key(self.seed, tablename, colname, 'distinct')
+            if colcfg.get('unique', False):
+                eprint('warning: unique of {}.{} is not enforced in addressable mode'.format(tablename, colname))
+
+        self.specs[key] = spec
+        return spec
+
+    def cell(self, tablename, colname, row):
+        spec = self.spec(tablename, colname)
+        rng = self.rng
+        rng.reset(spec['key'], row)
+        if spec['null'] and rng.random() < spec['null']:
+            return None
+
+        kind = spec['kind']
+        if kind == 'sequence':
+            return spec['start'] + row * spec['step']
+        if kind == 'foreign':
+            parent, column = spec['parent']
+            count = self.numrows.get(parent, 0)
+            if count <= 0:
+                return None
+            return self.cell(parent, column, rng.randrange(count))
+        if kind == 'distinct':
+            # the k-th distinct value is generated like a row of its own
+            rng.reset(spec['distinct_key'], rng.randrange(spec['distinct']))
+        return spec['fn']()
+
+    def check_table(self, table):
+        if table['name'] in self.warned:
+            return
+        self.warned.add(table['name'])
+        for unique in table['unique']:
+            columns = [self.config.get_column(table['name'], c) for c in unique]
+            if not all([c['generator'] == 'sequence' for c in columns]):
+                eprint('warning: unique {} of {} is not enforced in addressable mode'.format(unique, table['name']))
+
+    def rows(self, tablename, colnames, start, stop):
+        '''
+        rows [start, stop) of the table
+        '''
+        self.check_table(self.config.get_table(tablename))
+        saved = helpers.fake.random
+        helpers.fake.random = self.rng
+        try:
+            return [tuple([self.cell(tablename, c, row) for c in colnames]) for row in range(start, stop)]
+        finally:
+            helpers.fake.random = saved
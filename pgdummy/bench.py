@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import argparse
+import math
+import sys
+import time
+
+from . import helpers
+from .fakedata import DummyDB
+from .sqlparser import parse
+from .synthetic import make_schema
+
+BASE = {'tables': 20, 'columns': 8, 'fk_depth': 3, 'fanout': 2, 'unique': 1}
+
+# dimension -> sizes, the other dimensions stay at BASE
+SCENARIOS = {
+    'tables' : [20, 80, 320],
+    'columns' : [8, 32, 128],
+    'fk_depth' : [2, 8, 32],
+    'fanout' : [1, 4, 16],
+    'unique' : [1, 4, 16],
+}
+
+STAGES = ['parse', 'config', 'order', 'generate']
+
+# growth exponent above which a stage is reported as super-linear
+SUPERLINEAR = 1.3
+
+def run_once(options, numrows):
+    '''
+    time each stage of a run on a synthetic schema, returns stage -> seconds
+    '''
+    sql, data = make_schema(**options)
+    helpers.cache = helpers.Cache()
+    dummy = DummyDB()
+    dummy.seed = 1
+    timings = {}
+
+    start = time.perf_counter()
+    dummy.tables = parse(sql)
+    timings['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for table in dummy.tables:
+        dummy.config.add_table(table)
+    dummy.config.update(data)
+    timings['config'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dummy.config.get_safe_order()
+    timings['order'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for table, batch in dummy.iter_data(numrows):
+        pass
+    timings['generate'] = time.perf_counter() - start
+    return timings
+
+def growth(t1, t2, s1, s2):
+    if t1 <= 0 or t2 <= 0 or s1 == s2:
+        return 0.0
+    return math.log(t2 / t1) / math.log(float(s2) / s1)
+
+def run_scenario(dimension, sizes, numrows, out=sys.stdout):
+    '''
+    run the stages for each size of [dimension], prints the timings and the growth
+    exponent between the sizes. returns the stages that grew super-linearly
+    '''
+    print('-- {} : {}'.format(dimension, sizes), file=out)
+    print('{:>8} {}'.format(dimension, ' '.join(['{:>10}'.format(s) for s in STAGES])), file=out)
+    results = []
+    for size in sizes:
+        options = dict(BASE)
+        options[dimension] = size
+        timings = run_once(options, numrows)
+        results.append((size, timings))
+        print('{:>8} {}'.format(size, ' '.join(['{:>10.4f}'.format(timings[s]) for s in STAGES])), file=out)
+
+    flagged = []
+    for (s1, t1), (s2, t2) in zip(results, results[1:]):
+        exponents = [growth(t1[s], t2[s], s1, s2) for s in STAGES]
+        print('{:>8} {}'.format('growth', ' '.join(['{:>10.2f}'.format(e) for e in exponents])), file=out)
+        for stage, e in zip(STAGES, exponents):
+            if e > SUPERLINEAR and stage not in flagged:
+                flagged.append(stage)
+    if flagged:
+        print('SUPER-LINEAR : {} with {}'.format(', '.join(flagged), dimension), file=out)
+    print(file=out)
+    return flagged
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='pgdummy.bench', description='scaling benchmarks on synthetic schemas')
+    parser.add_argument('-d', '--dimension', dest='dimensions', action='append', choices=list(SCENARIOS.keys()), help = 'dimensions to scale (default: all)')
+    parser.add_argument('--sizes', dest='sizes', type=str, default=None, help = 'comma separated sizes, overrides the scenario sizes')
+    parser.add_argument('-n', '--numrows', dest='numrows', type=int, default=20, help = 'rows per table')
+    args = parser.parse_args(argv)
+
+    flagged = {}
+    for dimension in args.dimensions or list(SCENARIOS.keys()):
+        sizes = [int(s) for s in args.sizes.split(',')] if args.sizes else SCENARIOS[dimension]
+        stages = run_scenario(dimension, sizes, args.numrows)
+        if stages:
+            flagged[dimension] = stages
+    return 1 if flagged else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import math
+import random
+
+from . import helpers
+
+# values up to this size are drawn from the shared random generator
+SMALL_SIZE = 256
+# values larger than this are generated while they're written, in chunks
+STREAM_SIZE = 1 << 20
+CHUNK_SIZE = 1 << 16
+DISTRIBUTIONS = ['fixed', 'uniform', 'lognormal']
+# generators of the provider -> text values
+GENERATORS = {'blob' : False, 'longtext' : True}
+
+# 64 characters, so that a random byte maps to an unbiased character. nothing to escape in COPY
+TEXT_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 .'
+TEXT_TABLE = bytes([ord(TEXT_ALPHABET[i % len(TEXT_ALPHABET)]) for i in range(256)])
+
+def random_bytes(rng, n):
+    if n <= 0:
+        return b''
+    return rng.getrandbits(n * 8).to_bytes(n, 'little')
+
+def random_text(rng, n):
+    return random_bytes(rng, n).translate(TEXT_TABLE).decode('ascii')
+
+class SizeDistribution:
+    '''
+    sizes of the values : fixed [size], uniform between [low] & [high] or lognormal around
+    the median [size] with the spread [sigma], within [low] & [high]. the sizes (eg. 4KB)
+    are parsed once, when the generator is built
+    '''
+    def __init__(self, size=16, low=None, high=None, distribution='fixed', sigma=1.0):
+        if distribution not in DISTRIBUTIONS:
+            raise Exception('invalid size distribution : {}, should be one of {}'.format(distribution, DISTRIBUTIONS))
+        self.size = helpers.parse_size(size)
+        self.low = helpers.parse_size(low) if low is not None else 0
+        self.high = helpers.parse_size(high) if high is not None else None
+        self.distribution = distribution
+        self.sigma = float(sigma)
+
+    def draw(self):
+        '''
+        size of the next value
+        '''
+        rng = helpers.fake.random
+        if self.distribution == 'uniform':
+            return rng.randint(self.low, self.size if self.high is None else self.high)
+        if self.distribution == 'lognormal':
+            n = max(self.low, int(rng.lognormvariate(math.log(max(self.size, 1)), self.sigma)))
+            return n if self.high is None else min(n, self.high)
+        return self.size
+
+class BlobGenerator:
+    '''
+    bytea (or [text]) values of the sizes of a SizeDistribution, see make_value
+    '''
+    def __init__(self, size=16, min=None, max=None, distribution='fixed', sigma=1.0, text=False):
+        self.sizes = SizeDistribution(size, min, max, distribution, sigma)
+        self.text = text
+
+    def next(self):
+        return make_value(self.sizes.draw(), self.text)
+
+class LargeValue:
+    '''
+    a large bytea/text value, only its size & seed are kept : the content is
+    generated in chunks when written (see chunks), or as a whole by value
+    '''
+    def __init__(self, size, seed, text=False):
+        self.size = size
+        self.seed = seed
+        self.text = text
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        rng = random.Random(self.seed)
+        remaining = self.size
+        while remaining > 0:
+            n = min(chunk_size, remaining)
+            remaining -= n
+            yield random_text(rng, n) if self.text else random_bytes(rng, n)
+
+    def value(self):
+        return ('' if self.text else b'').join(self.chunks())
+
+    def __len__(self):
+        return self.size
+
+    def __eq__(self, other):
+        return isinstance(other, LargeValue) and (self.size, self.seed, self.text) == (other.size, other.seed, other.text)
+
+    def __hash__(self):
+        return hash((self.size, self.seed, self.text))
+
+    def __str__(self):
+        # bytea hex format
+        return self.value() if self.text else '\\x' + self.value().hex()
+
+    def __repr__(self):
+        return '<{} of {} bytes>'.format('text' if self.text else 'bytea', self.size)
+
+def make_value(size, text=False):
+    '''
+    bytes (or text) of [size] from bulk random bytes
+    '''
+    rng = helpers.fake.random
+    if size <= SMALL_SIZE:
+        return random_text(rng, size) if text else random_bytes(rng, size)
+    seed = rng.getrandbits(64)
+    if size > STREAM_SIZE:
+        return LargeValue(size, seed, text)
+    rng = random.Random(seed)
+    return random_text(rng, size) if text else random_bytes(rng, size)
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import os.path
+import tempfile
+
+from .helpers import debugprint, eprint
+from .partitions import leaf_name
+
+# build manifest in the output directory : table -> fingerprint & files
+MANIFEST = '.pgdummy-build.json'
+
+def parents(tablecfg):
+    '''
+    tables referenced by the foreign key columns of a table config
+    '''
+    names = []
+    for column in tablecfg['columns']:
+        if column['generator'] == 'foreign':
+            name = column['key'].split('.')[0]
+            if name not in names and name != tablecfg['name']:
+                names.append(name)
+    return names
+
+def fingerprints(dummy, settings):
+    '''
+    fingerprint of every table : its parsed definition, resolved column config, the
+    run [settings] and the fingerprints of the tables it references. a change to a
+    table changes the fingerprints of all its foreign key descendants
+    '''
+    prints = {}
+    for table in dummy.ordered_tables():
+        tablecfg = dummy.config.get_table(table.name)
+        spec = {
+            'table' : table.get_name(),
+            'columns' : [(c.name, c.typename) for c in table.columns],
+            'config' : tablecfg,
+            'settings' : settings,
+            'parents' : [prints.get(name) for name in parents(tablecfg)],
+        }
+        data = json.dumps(spec, sort_keys=True, default=str)
+        prints[table.name] = hashlib.sha256(data.encode()).hexdigest()[:24]
+    return prints
+
+def ancestors(dummy, names):
+    '''
+    tables the foreign keys of [names] depend on, directly or not
+    '''
+    found = set()
+    pending = list(names)
+    while pending:
+        for name in parents(dummy.config.get_table(pending.pop())):
+            if name not in found:
+                found.add(name)
+                pending.append(name)
+    return found
+
+class BuildCache:
+    '''
+    the files of the tables in an output directory, with the fingerprints they were generated with.
+    a table is reused as long as its fingerprint matches and its files are all there
+    '''
+    def __init__(self, dirname):
+        self.dirname = dirname
+        self.filename = os.path.join(dirname, MANIFEST)
+        self.tables = {}
+        if os.path.exists(self.filename):
+            try:
+                with open(self.filename) as fp:
+                    self.tables = json.load(fp).get('tables', {})
+            except ValueError:
+                eprint('warning: ignoring invalid build manifest : {}'.format(self.filename))
+
+    def is_current(self, name, fingerprint):
+        entry = self.tables.get(name)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return False
+        return all([os.path.exists(os.path.join(self.dirname, f)) for f in entry['files']])
+
+    def invalidate(self, name):
+        '''
+        forget a table and remove its files, before it's generated again
+        '''
+        entry = self.tables.pop(name, None)
+        if entry is None:
+            return
+        for f in entry['files']:
+            path = os.path.join(self.dirname, f)
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def table_files(self, table, tablecfg, jobs=1):
+        '''
+        files of a table in the directory : its own and those of its leaf partitions, per part with [jobs]
+        '''
+        names = [table.get_name()] + [leaf_name(tablecfg, p) for p in tablecfg.get('partitions', [])]
+        suffixes = [''] if jobs <= 1 else ['.{}'.format(part) for part in range(jobs)]
+        files = []
+        for name in names:
+            for suffix in suffixes:
+                f = '{}{}.sql'.format(name, suffix)
+                if os.path.exists(os.path.join(self.dirname, f)):
+                    files.append(f)
+        return files
+
+    def record(self, name, fingerprint, files):
+        debugprint('build cache : {} -> {} {}'.format(name, fingerprint, files))
+        self.tables[name] = {'fingerprint' : fingerprint, 'files' : files}
+
+    def save(self):
+        # written to a temp file first, an interrupted build leaves the previous manifest
+        fd, tmpname = tempfile.mkstemp(dir=self.dirname, suffix='.tmp')
+        with os.fdopen(fd, 'w') as fp:
+            json.dump({'tables' : self.tables}, fp, indent=2, sort_keys=True)
+        os.chmod(tmpname, 0o644)
+        os.replace(tmpname, self.filename)
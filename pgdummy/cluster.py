@@ -0,0 +1,136 @@
+import heapq
+import itertools
+import pickle
+import tempfile
+
+from . import helpers
+from .helpers import debugprint
+
+# rows per spilled batch in a run file
+SPILL_BATCH = 1000
+
+def sort_key(values):
+    '''
+    key of the cluster column values, nulls last
+    '''
+    return tuple([(v is None, v) for v in values])
+
+class Run:
+    '''
+    sorted (key, row) items spilled to a temporary file
+    '''
+    def __init__(self, items):
+        self.fp = tempfile.TemporaryFile()
+        self.count = 0
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= SPILL_BATCH:
+                self.dump(batch)
+                batch = []
+        if batch:
+            self.dump(batch)
+
+    def dump(self, batch):
+        pickle.dump(batch, self.fp, pickle.HIGHEST_PROTOCOL)
+        self.count += len(batch)
+
+    def __iter__(self):
+        self.fp.seek(0)
+        try:
+            while True:
+                for item in pickle.load(self.fp):
+                    yield item
+        except EOFError:
+            pass
+        finally:
+            self.fp.close()
+
+class ExternalSorter:
+    '''
+    sorts (key, row) items in memory runs of [run_rows], spilled to temporary files and
+    merged [fanin] runs at a time. a single run is never spilled
+    '''
+    def __init__(self, reverse=False, run_rows=100000, fanin=64):
+        self.reverse = reverse
+        self.run_rows = max(1, run_rows)
+        self.fanin = max(2, fanin)
+        self.runs = []
+        self.items = []
+
+    def sort(self, items):
+        items.sort(key=lambda item: item[0], reverse=self.reverse)
+        return items
+
+    def add(self, items):
+        self.items.extend(items)
+        if len(self.items) >= self.run_rows:
+            self.spill()
+
+    def spill(self):
+        if self.items:
+            self.runs.append(Run(self.sort(self.items)))
+            self.items = []
+
+    def merge(self, runs):
+        return heapq.merge(*runs, key=lambda item: item[0], reverse=self.reverse)
+
+    def __iter__(self):
+        if not self.runs:
+            return iter(self.sort(self.items))
+        self.spill()
+        debugprint('external sort : {} runs'.format(len(self.runs)))
+        # bounded no.of open runs : merge the oldest ones into a new run
+        while len(self.runs) > self.fanin:
+            runs, self.runs = self.runs[:self.fanin], self.runs[self.fanin:]
+            self.runs.append(Run(self.merge(runs)))
+        return self.merge(self.runs)
+
+class Clusterer:
+    '''
+    orders the rows of a table by the [columns], with a target [correlation] between the
+    physical order and the column order (-1 to 1, negative for descending). a share of
+    1 - |correlation| of the rows get the sort key of a random row of the same run, which puts
+    them at a position independent of their own values
+    '''
+    def __init__(self, colnames, columns, correlation=1.0, run_rows=100000):
+        self.index = [colnames.index(c) for c in columns]
+        self.strength = abs(float(correlation))
+        self.sorter = ExternalSorter(correlation < 0, run_rows)
+        self.run_rows = run_rows
+        self.keys = []
+        self.rows = []
+
+    def add(self, rows):
+        index = self.index
+        for row in rows:
+            self.keys.append(sort_key([row[i] for i in index]))
+            self.rows.append(row)
+        if len(self.rows) >= self.run_rows:
+            self.flush()
+
+    def flush(self):
+        keys = self.keys
+        if self.strength < 1.0:
+            random = helpers.fake.random
+            original = list(keys)
+            for n in range(len(keys)):
+                if random.random() >= self.strength:
+                    keys[n] = original[random.randrange(len(original))]
+        self.sorter.add(list(zip(keys, self.rows)))
+        self.keys = []
+        self.rows = []
+
+    def batches(self, batches, batch_size):
+        '''
+        consume the generated [batches], yield the ordered rows in batches of [batch_size]
+        '''
+        for batch in batches:
+            self.add(batch)
+        self.flush()
+        items = iter(self.sorter)
+        while True:
+            batch = [row for _, row in itertools.islice(items, batch_size)]
+            if not batch:
+                break
+            yield batch
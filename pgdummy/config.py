@@ -6,15 +6,26 @@ from functools import partial
 import yaml
 from faker import Faker
 
-from . import helpers
+from . import blobs, helpers, partitions, patterns, plugins, pool, stats
+from .fkpool import OVERFLOW_MODES
 from .helpers import debugprint, eprint
 from .providers import (DistinctGenerator, SequenceGenerator, SimpleProvider,
-                        UniqueGenerator, get_default_generator)
+                        StatsGenerator, UniqueGenerator, UniquePattern,
+                        get_default_generator)
 
 
 class Config:
     SYS_KEYS = ['type', 'name', 'has_default', 'is_null']
     STD_ARGS = ['min', 'max' , 'maxdigits', 'format','start', 'end', 'precision']
+    # null fraction set in the generated config for nullable columns
+    DEFAULT_NULL_FRACTION = 0.1
+    # stateful generators, constructed with the column options
+    CLASS_GENERATORS = {
+        'sequence' : SequenceGenerator,
+        'stats' : StatsGenerator,
+    }
+    # column keys that are not options of a plugin
+    PLUGIN_RESERVED = SYS_KEYS + ['generator', 'distinct', 'unique', 'pool', 'null_fraction', 'is_foreignkey', 'fk_memory', 'fk_overflow']
     def __init__(self):
         self.filename = None
         self.data = {"tables": []}
@@ -25,38 +36,76 @@ class Config:
         
     def __add_to_genmap(self, tablename, coldata):
         key = helpers.COL_MAP_KEY_FMT.format(tablename, coldata['name'])
-        
+        fn = self.build_generator(tablename, coldata)
+        if fn is None:
+            return False
+        self.genmap[key] = fn
+
+    def build_generator(self, tablename, coldata, wrap=True):
+        '''
+        resolve the generator function of a column. without [wrap], the
+        stateful distinct/unique wrappers are left out
+        '''
         if not coldata or 'generator' not in coldata or len(coldata['generator']) == 0:
             eprint ('no valid info for {}: {}. -- {}'.format(tablename, coldata['name'], coldata))
-            return False
+            return None
     
-        if not hasattr(self.fake, coldata['generator']) and coldata['generator'] != 'sequence':
+        plugin = plugins.get(coldata['generator'])
+        if plugin is None and not hasattr(self.fake, coldata['generator']) and coldata['generator'] not in self.CLASS_GENERATORS:
             eprint ('no valid generator found {}: {}. -- {}'.format(tablename, coldata['name'], coldata))
-            return False
+            return None
     
         # fill args
         args = {}
+        domain = None
+        # string patterns & hex, parsed once
+        pattern = patterns.column_pattern(coldata)
 
-        if coldata['generator'] != 'sequence':
-            fn = getattr(self.fake, coldata['generator'])
+        if plugin is not None:
+            args = plugins.plugin_options(plugin, coldata, self.PLUGIN_RESERVED)
+            domain = plugins.domain_size(plugin, args)
+            # one value at a time for the row addressable generation
+            fn = plugins.BatchGenerator(plugin, args, None if wrap else 1).next
+        elif pattern is not None:
+            # the pattern options identify a pool of the values
+            args = dict([(k, coldata[k]) for k in ['pattern', 'letters'] if k in coldata])
+            domain = pattern.domain
+            fn = plugins.BatchGenerator(pattern, {}, None if wrap else 1).next
         else:
-            fn = SequenceGenerator
-        
-        for k in inspect.signature(fn).parameters.keys():
-            if k in coldata:
-                args[k] = coldata[k]
+            if coldata['generator'] in self.CLASS_GENERATORS:
+                fn = self.CLASS_GENERATORS[coldata['generator']]
+            else:
+                fn = getattr(self.fake, coldata['generator'])
 
-        if coldata['generator'] == 'sequence':
-            fn = SequenceGenerator(**args).next
-        else:
-            # check for Distinct
-            fn=partial(fn, **args)
-            if 'distinct' in coldata:
-                fn = DistinctGenerator(fn, coldata['distinct']).next
-            if 'unique' in coldata:
-                fn = UniqueGenerator(fn).next
+            for k in inspect.signature(fn).parameters.keys():
+                if k in coldata:
+                    args[k] = coldata[k]
+
+            if coldata['generator'] in self.CLASS_GENERATORS:
+                return fn(**args).next
+            if coldata['generator'] in blobs.GENERATORS:
+                # the sizes are parsed here, not for every value
+                fn = blobs.BlobGenerator(text=blobs.GENERATORS[coldata['generator']], **args).next
+            else:
+                fn=partial(fn, **args)
+
+        # sample from a pre-built pool of values
+        if 'pool' in coldata:
+            fn = pool.get_pool(coldata['generator'], fn, args, int(coldata['pool'])).next
+        # spread the partition key over __partitions leaves
+        keyfn = partitions.partition_key_generator(self.get_table(tablename), coldata, fn, cycle=wrap)
+        # unique values of an exact pattern are drawn from a permutation of its domain
+        permutable = pattern is not None and pattern.exact and keyfn is fn and not ('pool' in coldata or 'distinct' in coldata)
+        fn = keyfn
+        if not wrap:
+            return fn
+        # check for Distinct
+        if 'distinct' in coldata:
+            fn = DistinctGenerator(fn, coldata['distinct']).next
+        if 'unique' in coldata:
+            fn = UniquePattern(pattern).next if permutable else UniqueGenerator(fn, domain).next
             
-        self.genmap[key] = fn
+        return fn
         
     def get_generator(self, tablename, colname):
         key = helpers.COL_MAP_KEY_FMT.format(tablename, colname)
@@ -68,6 +117,16 @@ class Config:
 
         foreigns = []
         for table in self.data["tables"]:
+            if 'cluster_by' in table:
+                names = [c['name'] for c in table['columns']]
+                for colname in table['cluster_by']:
+                    if colname not in names:
+                        raise Exception('invalid __cluster_by of {}, column:{} - NOT FOUND'.format(table['name'], colname))
+            if 'correlation' in table:
+                correlation = table['correlation']
+                if not isinstance(correlation, (int, float)) or correlation < -1 or correlation > 1:
+                    eprint('invalid __correlation for {} : {}'.format(table['name'], correlation))
+                    raise Exception('__correlation should be between -1 and 1')
             for column in table['columns']:
                 success = True
                 if column['generator'] == 'foreign':
@@ -76,6 +135,14 @@ class Config:
                         raise Exception('foreign key not specified')
                     else:
                         foreigns.append(column['key'])
+                if 'null_fraction' in column:
+                    fraction = column['null_fraction']
+                    if not isinstance(fraction, (int, float)) or fraction < 0 or fraction > 1:
+                        eprint('invalid null_fraction for {}.{} : {}'.format(table['name'], column['name'], fraction))
+                        raise Exception('null_fraction should be between 0 and 1')
+                if column.get('fk_overflow', 'spill') not in OVERFLOW_MODES:
+                    eprint('invalid fk_overflow for {}.{} : {}'.format(table['name'], column['name'], column['fk_overflow']))
+                    raise Exception('fk_overflow should be one of {}'.format(OVERFLOW_MODES))
                 if success and not self.get_generator(table['name'], column['name']):
                     self.__add_to_genmap(table['name'], column)
 
@@ -126,9 +193,33 @@ class Config:
             return
         with open(filename, "r") as fp:
             data = yaml.load(fp, Loader=yaml.FullLoader)
-            self.__update_config(data)
+            self.update(data)
             self.filename= filename
 
+    def update(self, data):
+        '''
+        apply config data (same structure as the yaml config) on top of the tables
+        '''
+        return self.__update_config(data)
+
+    def load_stats(self, filename):
+        '''
+        configure columns & row counts from a pg_stats/pg_class export (csv or json)
+        '''
+        if stats.apply_stats(self, filename):
+            self.validate(force=True)
+
+    def default_nulls(self):
+        '''
+        null_fraction for the generated config : nullable columns get nulls, except the
+        ones part of a unique/primary key. without it, columns have no nulls
+        '''
+        for table in self.data['tables']:
+            unique_cols = set([col for unique in table['unique'] for col in unique])
+            for c in table['columns']:
+                if c.get('is_null') and c['name'] not in unique_cols and c['generator'] != 'sequence':
+                    c.setdefault('null_fraction', self.DEFAULT_NULL_FRACTION)
+
     def store(self, filename=None, minimal=True):
         # change the structure
         data = {'tables': {}}
@@ -153,6 +244,8 @@ class Config:
                 fp.write(out)
 
     def __update_config(self, newdata):
+        if 'plugins' in newdata:
+            plugins.load_config(newdata['plugins'])
         if 'tables' not in newdata:
             return False
 
@@ -162,6 +255,17 @@ class Config:
                 newtable = newdata['tables'][table['name']]
                 if '__numrows' in newtable:
                     table['numrows'] = newtable['__numrows']
+                if '__fanout' in newtable:
+                    table['fanout'] = newtable['__fanout']
+                if '__partitions' in newtable:
+                    table['fill_partitions'] = int(newtable['__partitions'])
+                if '__cluster_by' in newtable:
+                    cluster_by = newtable['__cluster_by']
+                    if type(cluster_by) != list:
+                        cluster_by = [a.strip() for a in str(cluster_by).split(',')]
+                    table['cluster_by'] = cluster_by
+                if '__correlation' in newtable:
+                    table['correlation'] = newtable['__correlation']
 
                 for column in table['columns']:
                     # find table in conf
@@ -183,6 +287,19 @@ class Config:
         debugprint(json.dumps(self.data, indent=4))
         self.validate(force=True)
 
+    def get_parents(self, tablename):
+        '''
+        tables referred to by the foreign generators of the table
+        '''
+        parents = []
+        table = self.get_table(tablename)
+        for column in table['columns']:
+            if column['generator'] == 'foreign':
+                t, _ = column['key'].split('.')
+                if t not in parents and t != tablename:
+                    parents.append(t)
+        return parents
+
     def get_safe_order(self):
         graph = {}
         idxmap = {}
@@ -253,4 +370,7 @@ class Config:
             #self.__add_to_genmap(table.name, c)
 
         t['unique'] = table.unique_constraints
+        if table.partition_by:
+            t['partition_by'] = table.partition_by
+            t['partitions'] = table.partitions
 
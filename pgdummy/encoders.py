@@ -0,0 +1,144 @@
+import re
+
+from . import blobs, helpers
+from .blobs import LargeValue
+
+# COPY text format representation of NULL
+NULL = '\\N'
+
+INT_TYPES = ['smallint', 'int', 'int2', 'int4', 'int8', 'integer', 'bigint',
+             'smallserial', 'serial', 'bigserial', 'serial2', 'serial4', 'serial8']
+FLOAT_TYPES = ['real', 'float4', 'float8', 'double precision', 'numeric', 'decimal']
+BOOL_TYPES = ['bool', 'boolean']
+
+# backslash, tab, newline & carriage return have to be escaped in COPY text format
+ESCAPE_TABLE = str.maketrans({
+    '\\' : '\\\\',
+    '\t' : '\\t',
+    '\n' : '\\n',
+    '\r' : '\\r',
+})
+_needs_escape = re.compile('[\\\\\t\n\r]').search
+
+def encode_text(v):
+    '''
+    encode any value as COPY text, escaping only when needed
+    '''
+    if v is None:
+        return NULL
+    s = v if type(v) is str else str(v)
+    if _needs_escape(s):
+        return s.translate(ESCAPE_TABLE)
+    return s
+
+def encode_int(v):
+    if type(v) is int:
+        return str(v)
+    return encode_text(v)
+
+def encode_bool(v):
+    if v is True:
+        return 't'
+    if v is False:
+        return 'f'
+    return encode_text(v)
+
+def encode_bytea(v):
+    '''
+    bytes in the hex format, with the backslash escaped for COPY
+    '''
+    if type(v) is bytes:
+        return '\\\\x' + v.hex()
+    return encode_text(v)
+
+def encode_large(v):
+    '''
+    large values are passed on as is, for the writer to stream them (see encode_chunks)
+    '''
+    if isinstance(v, LargeValue):
+        return v
+    return encode_text(v)
+encode_large.streams = True
+
+def encode_large_bytea(v):
+    if isinstance(v, LargeValue):
+        return v
+    return encode_bytea(v)
+encode_large_bytea.streams = True
+
+def encode_chunks(value):
+    '''
+    COPY text of a large value in chunks
+    '''
+    if not value.text:
+        yield '\\\\x'
+    for chunk in value.chunks():
+        yield chunk if value.text else chunk.hex()
+
+def decimal_encoder(precision):
+    fmt = '%.{}f'.format(int(precision))
+    def encode(v):
+        if type(v) is float:
+            return fmt % v
+        return encode_text(v)
+    return encode
+
+def may_stream(colcfg):
+    '''
+    true when the generator can make values too large to build in memory
+    '''
+    if colcfg.get('generator') not in ['blob', 'longtext']:
+        return False
+    size = colcfg.get('size', 16)
+    if colcfg.get('distribution', 'fixed') == 'lognormal' and colcfg.get('max') is None:
+        return True
+    return helpers.parse_size(colcfg.get('max') or size) > blobs.STREAM_SIZE or helpers.parse_size(size) > blobs.STREAM_SIZE
+
+def get_encoder(colcfg, stream=False):
+    '''
+    pick the COPY encoder for a column based on its pg type & generator options.
+    with [stream], large values are left for the writer to write in chunks
+    '''
+    if not colcfg:
+        return encode_text
+
+    typename = colcfg.get('type', None)
+    if may_stream(colcfg):
+        if stream:
+            return encode_large_bytea if typename == 'bytea' else encode_large
+        return materialize(encode_bytea if typename == 'bytea' else encode_text)
+    if typename == 'bytea':
+        return encode_bytea
+    if typename in INT_TYPES or colcfg.get('generator') == 'sequence':
+        return encode_int
+    if typename in BOOL_TYPES:
+        return encode_bool
+    if typename in FLOAT_TYPES or colcfg.get('generator') == 'decimal':
+        if colcfg.get('precision', None) is not None:
+            return decimal_encoder(colcfg['precision'])
+    return encode_text
+
+def materialize(encoder):
+    def encode(v):
+        if isinstance(v, LargeValue):
+            v = v.value()
+        return encoder(v)
+    return encode
+
+def get_encoders(colcfgs, stream=False):
+    return [get_encoder(c, stream) for c in colcfgs]
+
+def streams(encoders):
+    return any([getattr(e, 'streams', False) for e in encoders])
+
+def encode_row(encoders, row):
+    return '\t'.join([e(v) for e, v in zip(encoders, row)])
+
+def encode_rows(encoders, rows):
+    '''
+    encode a batch of rows column by column, returns the list of COPY lines
+    '''
+    if not rows:
+        return []
+    columns = [list(map(e, col)) for e, col in zip(encoders, zip(*rows))]
+    return list(map('\t'.join, zip(*columns)))
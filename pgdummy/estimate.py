@@ -0,0 +1,245 @@
+import math
+import string
+import sys
+
+from . import helpers, patterns, plugins
+from .providers import UniquePattern
+
+# rows generated per table for the estimate
+SAMPLE_ROWS = 2000
+# values drawn to estimate a domain from its collisions
+DOMAIN_DRAWS = 2000
+# hash table slot, hash & slack of a set entry
+SET_ENTRY = 40
+# share of a unique domain above which the retries pile up
+TIGHT = 0.5
+
+class CountingStream:
+    '''
+    file like sink, counts the bytes written
+    '''
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data.encode('utf-8'))
+        return len(data)
+
+    def flush(self):
+        pass
+
+def average(values):
+    return sum(values) / len(values) if values else 0
+
+def column_domain(config, tablename, colcfg, counts):
+    '''
+    no.of distinct values the column can take, None when unbounded or unknown
+    '''
+    generator = colcfg.get('generator')
+    if generator == 'sequence':
+        return None
+    if 'distinct' in colcfg:
+        return int(colcfg['distinct'])
+    plugin = plugins.get(generator)
+    if plugin is not None:
+        return plugins.domain_size(plugin, plugins.plugin_options(plugin, colcfg, config.PLUGIN_RESERVED))
+    if generator == 'integer':
+        return max(0, int(colcfg.get('max', 100000)) - int(colcfg.get('min', 0)) + 1)
+    if generator == 'boolean':
+        return 2
+    if generator == 'oneof':
+        return len(set([str(v) for v in colcfg.get('items', [0])]))
+    pattern = patterns.column_pattern(colcfg)
+    if pattern is not None:
+        return pattern.domain
+    if generator in ['string', 'alphanumeric']:
+        letters = len(colcfg.get('letters', string.ascii_uppercase)) if generator == 'string' else 36
+        low, high = int(colcfg.get('min', 1)), int(colcfg.get('max', 16))
+        return sum([letters ** n for n in range(low, high + 1)])
+    if generator == 'stats' and colcfg.get('n_distinct'):
+        n_distinct = float(colcfg['n_distinct'])
+        # negative : a fraction of the rows
+        return int(round(-n_distinct * counts.get(tablename, 0))) if n_distinct < 0 else int(n_distinct)
+    if generator == 'foreign':
+        parent = colcfg['key'].split('.')[0]
+        return counts.get(parent)
+    return None
+
+def sampled_domain(config, tablename, colcfg):
+    '''
+    domain estimated from the collisions among DOMAIN_DRAWS values of the generator,
+    None when there were none (large domain)
+    '''
+    fn = config.build_generator(tablename, colcfg, wrap=False)
+    if fn is None:
+        return None
+    seen = set([fn() for n in range(DOMAIN_DRAWS)])
+    distinct = len(seen)
+    if distinct >= DOMAIN_DRAWS:
+        return None
+    if distinct <= 1:
+        return distinct
+    # solve distinct = N * (1 - exp(-draws / N)) for N
+    low, high = float(distinct), float(DOMAIN_DRAWS) ** 2
+    for n in range(100):
+        mid = (low + high) / 2
+        if mid * (1 - math.exp(-DOMAIN_DRAWS / mid)) < distinct:
+            low = mid
+        else:
+            high = mid
+    return int(round(low))
+
+class Estimate:
+    '''
+    time, output size & memory of a run, extrapolated from a sample of every table
+    generated through the real generators and writer (into a byte counter)
+    '''
+    def __init__(self, dummy, numrows, sample_rows=SAMPLE_ROWS):
+        self.dummy = dummy
+        self.config = dummy.config
+        self.numrows = numrows
+        self.sample_rows = sample_rows
+        self.tables = []
+        self.problems = []
+
+    def counts(self):
+        counts = {}
+        for table in self.config.data['tables']:
+            counts[table['name']] = int(table.get('numrows', self.numrows))
+        return counts
+
+    def unique_sets(self, tablename, kept=False):
+        '''
+        column lists tracked in a set while generating : unique constraints & unique columns.
+        with [kept], unique pattern columns (drawn from a permutation, nothing kept) are left out
+        '''
+        table = self.config.get_table(tablename)
+        sets = [list(unique) for unique in table['unique']]
+        for column in table['columns']:
+            if column.get('unique', False) and column['generator'] not in ['sequence', 'foreign']:
+                gen = getattr(self.config.get_generator(tablename, column['name']), '__self__', None)
+                if not (kept and isinstance(gen, UniquePattern)):
+                    sets.append([column['name']])
+        return sets
+
+    def check_domain(self, tablename, columns, numrows, counts):
+        domain = 1
+        for colname in columns:
+            colcfg = self.config.get_column(tablename, colname)
+            size = column_domain(self.config, tablename, colcfg, counts)
+            if size is None and colcfg['generator'] not in ['sequence', 'foreign']:
+                size = sampled_domain(self.config, tablename, colcfg)
+            if size is None:
+                return None
+            domain *= size
+            # rows with a null never collide
+            numrows = numrows * (1 - (colcfg.get('null_fraction', 0) or 0))
+        if numrows > domain:
+            self.problems.append('unique {} of {} : {} rows needed, the domain holds ~{}'.format(
+                columns, tablename, int(numrows), domain))
+        elif numrows > TIGHT * domain:
+            self.problems.append('unique {} of {} : {} rows fill {:.0%} of the ~{} values, expect many retries'.format(
+                columns, tablename, int(numrows), numrows / domain, domain))
+        return domain
+
+    def run(self, writer):
+        counts = self.counts()
+        sink = CountingStream()
+        writer.out = sink
+        timings = {}
+        samples = self.dummy.sample_rows(self.sample_rows, writer, timings, counts)
+        addressable = self.dummy.addressable is not None
+
+        for table in self.dummy.ordered_tables():
+            name = table.name
+            rows = samples.get(name, [])
+            numrows = counts[name]
+            seconds = timings.get(name, 0)
+            info = {
+                'name' : name,
+                'numrows' : numrows,
+                'sampled' : len(rows),
+                'rate' : len(rows) / seconds if seconds > 0 else 0,
+                'row_bytes' : 0,
+                'memory' : 0,
+            }
+            self.tables.append(info)
+            if not rows:
+                continue
+
+            colnames = [c.name for c in table.columns]
+            if not addressable:
+                # referenced values are kept for the foreign keys
+                for i, colname in enumerate(colnames):
+                    colcfg = self.config.get_column(name, colname)
+                    if colcfg.get('is_foreignkey', False):
+                        values = [r[i] for r in rows if r[i] is not None]
+                        memory = numrows * (average([helpers.value_size(v) for v in values]) + SET_ENTRY)
+                        # bounded by fk_memory, beyond it the pool is sampled or spilled
+                        limit = colcfg.get('fk_memory') or self.dummy.fk_memory
+                        info['memory'] += min(memory, helpers.parse_size(limit)) if limit else memory
+                # every unique key generated is kept
+                for columns in self.unique_sets(name, kept=True):
+                    index = [colnames.index(c) for c in columns]
+                    keys = [tuple([r[i] for i in index]) for r in rows]
+                    info['memory'] += numrows * (average([helpers.value_size(k) for k in keys]) + SET_ENTRY)
+
+            # a unique constraint can also be a unique column of the config, checked once
+            checked = []
+            for columns in self.unique_sets(name):
+                if columns not in checked:
+                    checked.append(columns)
+                    self.check_domain(name, columns, numrows, counts)
+
+        self.measure_bytes(samples, writer)
+        return self
+
+    def measure_bytes(self, samples, writer):
+        '''
+        output bytes per row of every table, through the writer
+        '''
+        for info in self.tables:
+            rows = samples.get(info['name'], [])
+            if not rows:
+                continue
+            table = self.dummy.get_table(info['name'])
+            colnames = [c.name for c in table.columns]
+            sink = CountingStream()
+            writer.out = sink
+            writer.table(table.get_name(), colnames, [self.config.get_column(info['name'], c) for c in colnames])
+            header = sink.bytes
+            writer.rows(rows)
+            info['row_bytes'] = (sink.bytes - header) / len(rows)
+
+    def report(self, jobs=1, out=sys.stdout):
+        total_time = 0
+        total_bytes = 0
+        total_memory = 0
+        print('{:<30} {:>14} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+            'table', 'rows', 'rows/s', 'time', 'bytes/row', 'size', 'memory'), file=out)
+        for info in self.tables:
+            seconds = info['numrows'] / info['rate'] if info['rate'] > 0 else 0
+            size = info['numrows'] * info['row_bytes']
+            total_time += seconds
+            total_bytes += size
+            total_memory += info['memory']
+            print('{:<30} {:>14} {:>10.0f} {:>10} {:>10.1f} {:>10} {:>10}'.format(
+                info['name'], info['numrows'], info['rate'], format_duration(seconds),
+                info['row_bytes'], helpers.format_size(size), helpers.format_size(info['memory'])), file=out)
+        print(file=out)
+        print('total time : {}{}'.format(format_duration(total_time / max(1, jobs)),
+            ' ({} jobs)'.format(jobs) if jobs > 1 else ''), file=out)
+        print('total size : {}'.format(helpers.format_size(total_bytes)), file=out)
+        # foreign key values & unique sets are kept for the whole run
+        print('peak memory : {} (foreign key values & unique sets)'.format(helpers.format_size(total_memory)), file=out)
+        for problem in self.problems:
+            print('WARNING: {}'.format(problem), file=out)
+        return total_time, total_bytes, total_memory
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return '{}s'.format(seconds)
+    if seconds < 3600:
+        return '{}m{:02d}s'.format(seconds // 60, seconds % 60)
+    return '{}h{:02d}m'.format(seconds // 3600, (seconds % 3600) // 60)
@@ -4,25 +4,44 @@ import os.path
 import random
 import string
 import sys
+import time
 import inspect
+import itertools
+import multiprocessing
+from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
-from . import helpers
+from . import helpers, loader, plugins
+from .addressable import AddressableGenerator
+from .build import BuildCache, ancestors, fingerprints
+from .cluster import Clusterer
 from .config import Config
+from .encoders import encode_rows, get_encoders
+from .estimate import Estimate
 from .helpers import debugprint, eprint
-from .providers import UniqueException
+from .providers import (SequenceGenerator, StatsGenerator, UniqueException,
+                        UniqueGenerator)
 from .sqlparser import parse
-from .writers import DumpWriter, InsertWriter, Writer
+from .stream import RateReporter, TokenBucket
+from .workload import DEFAULT_MIX, Workload
+from .writers import (ConnectionWriter, DirectoryWriter, DumpWriter,
+                      InsertWriter, LoadWriter, Writer)
 
 
 class Unique_Cache:
     def __init__(self):
         self.cache = {}
 
+    def _key(self, table, cols):
+        return (table, tuple(cols.keys())), tuple(cols.values())
+
+    def contains(self, table, cols):
+        key, value = self._key(table, cols)
+        return value in self.cache.get(key, ())
+
     def add(self, table, cols):
-        key = '{}:{}'.format(table, str(cols.keys()))
-        value = str(cols.values())
+        key, value = self._key(table, cols)
         self.cache.setdefault(key, set())
         if value in self.cache[key]:
             return False
@@ -30,10 +49,53 @@ class Unique_Cache:
             self.cache[key].add(value)
             return True
 
+class CollisionMonitor:
+    '''
+    tracks how often a unique constraint collides, as a moving average of the
+    collision probability per attempt, to spot domains close to exhaustion
+    '''
+    WARN_RATE = 0.5
+    FAIL_RATE = 0.99
+    # weight of the latest row in the moving average
+    ALPHA = 0.02
+    # rows before the rate is trusted
+    MIN_ROWS = 50
+
+    def __init__(self):
+        self.stats = {}
+
+    def record(self, tablename, unique, retries):
+        key = (tablename, tuple(unique))
+        stat = self.stats.setdefault(key, {'rows': 0, 'retries': 0, 'rate': 0.0, 'warned': False, 'exhausted': False})
+        stat['rows'] += 1
+        stat['retries'] += retries
+        stat['rate'] += self.ALPHA * (retries / (retries + 1.0) - stat['rate'])
+        if stat['rows'] < self.MIN_ROWS:
+            return
+
+        if stat['rate'] > self.FAIL_RATE and not stat['exhausted']:
+            stat['exhausted'] = True
+            eprint('unique {} of {} exhausted after {} rows : {:.1%} of the attempts collide'.format(
+                list(unique), tablename, stat['rows'], stat['rate']))
+        elif stat['rate'] > self.WARN_RATE and not stat['warned']:
+            stat['warned'] = True
+            eprint('warning: unique {} of {} is close to exhaustion after {} rows, {:.1%} of the attempts collide'.format(
+                list(unique), tablename, stat['rows'], stat['rate']))
+
+    def exhausted(self, tablename):
+        for (t, _), stat in self.stats.items():
+            if t == tablename and stat['exhausted']:
+                return True
+        return False
+
 class DataGenerator:
+    # regeneration attempts of a row, on unique constraint violations
+    max_attempts = 100
+
     def __init__(self, config : Config):
         self.config = config
         self.unique_cache = Unique_Cache()
+        self.monitor = CollisionMonitor()
         self.table = None
 
     def rand_str(self, maxsize, minsize=1):
@@ -47,7 +109,39 @@ class DataGenerator:
     def col(self, colname, tablename):
         return self.get_value_for(colname, tablename)
 
-    def row(self, columns, tablename):
+    def null_masks(self, columns, tablename, count):
+        '''
+        decide upfront which cells of the next [count] rows are null.
+        returns a list with a set of null column names (or None) per row
+        '''
+        masks = [None] * count
+        random = helpers.fake.random.random
+        for colname in columns:
+            colcfg = self.config.get_column(tablename, colname)
+            fraction = colcfg.get('null_fraction', 0) if colcfg else 0
+            if not fraction:
+                continue
+            for n in range(count):
+                if random() < fraction:
+                    if masks[n] is None:
+                        masks[n] = set()
+                    masks[n].add(colname)
+        return masks
+
+    def violated(self, tablename, valuemap):
+        '''
+        first unique constraint the values collide on, None when the row is unique
+        '''
+        for unique in self.table['unique']:
+            colvalues = dict([(col, valuemap[col]) for col in unique])
+            # nulls never conflict
+            if None in colvalues.values():
+                continue
+            if self.unique_cache.contains(tablename, colvalues):
+                return unique
+        return None
+
+    def row(self, columns, tablename, nulls=None):
         if self.table is None or self.table['name'] != tablename:
             self.table = None
             for table in self.config.data['tables']:
@@ -58,56 +152,78 @@ class DataGenerator:
             if self.table is None:
                 raise Exception('table [{}] - not found'.format(tablename))
 
-        success = False
-        attempt = 0
-        max_attempts = 1000
-        while not success and attempt < max_attempts:
-            success = True
-            attempt += 1
-            foreigns = []
-            valuemap={}
-            for colname in columns:
-                value = self.col(colname, tablename)
-                valuemap[colname] = value
-                colcfg = self.config.get_column(tablename,  colname)
-
-                # store
-                if 'is_foreignkey' in colcfg and colcfg['is_foreignkey']:
-                    foreigns.append((colname, value))
-
-            # unique constraints check
-            colvalues = {}
-            for unique in self.table['unique']:
-                colvalues = {}
-                for col in unique:
-                    colvalues[col] = valuemap[col]
-
-                if not self.unique_cache.add(tablename, colvalues):
-                    debugprint ('Failed to unique : {}'.format(colvalues))
-                    success = False
-                    break
-
-        if not success:
-            raise Exception('unable to generate unique row : {}'.format(colvalues))
+        valuemap = {}
+        for colname in columns:
+            if nulls and colname in nulls:
+                valuemap[colname] = None
+            else:
+                valuemap[colname] = self.col(colname, tablename)
+
+        # on a collision regenerate only the columns of the violated constraint
+        retries = {}
+        unique = self.violated(tablename, valuemap)
+        while unique is not None:
+            key = tuple(unique)
+            retries[key] = retries.get(key, 0) + 1
+            if retries[key] > self.max_attempts:
+                colvalues = dict([(col, valuemap[col]) for col in unique])
+                self.monitor.record(tablename, unique, retries[key])
+                raise UniqueException('unable to generate unique {} for {} within {} attempts, last : {}'.format(
+                    list(unique), tablename, self.max_attempts, colvalues))
+            debugprint ('Failed to unique : {}'.format(unique))
+            for col in unique:
+                if not (nulls and col in nulls):
+                    valuemap[col] = self.col(col, tablename)
+            unique = self.violated(tablename, valuemap)
+
+        for unique in self.table['unique']:
+            colvalues = dict([(col, valuemap[col]) for col in unique])
+            if None not in colvalues.values():
+                self.unique_cache.add(tablename, colvalues)
+            self.monitor.record(tablename, unique, retries.get(tuple(unique), 0))
 
         # store only after valid row
         # store for foreign key lookup
         colvalues = []
         for colname in columns:
-            colvalues.append(valuemap[colname])
+            value = valuemap[colname]
+            colvalues.append(value)
+            colcfg = self.config.get_column(tablename,  colname)
+            if value is not None and colcfg.get('is_foreignkey', False):
+                helpers.cache.add(tablename, colname, value)
 
-        for fk in foreigns:
-            helpers.cache.add(tablename, fk[0], fk[1])
-            
-        return colvalues
+        return tuple(colvalues)
 
 class DummyDB:
+    # rows handed over to the writer at once
+    batch_size = 1000
+    # rows generated per table to measure the row size
+    sample_size = 200
+    # rows sorted in memory per run of __cluster_by, larger tables are merged from spilled runs
+    sort_run_rows = 100000
+    # heap tuple header + line pointer, added to the text size of a row
+    TUPLE_OVERHEAD = 28
+    # memory (bytes) of a foreign key pool before it overflows, see fk_overflow & helpers.Cache
+    fk_memory = None
+    fk_overflow = 'spill'
+    # report the foreign key pools after the run
+    summary = False
+
     def __init__(self):
         self.tables = []
         self.schema = ''
         self.config = Config()
         self.datagen = DataGenerator(self.config)
         self.seed = None
+        # row addressable generation
+        self.addressable = None
+        # (start, stop) rows or (part, parts) to generate of each table, addressable only
+        self.row_range = None
+        self.part = None
+        # tables loaded by seed_pools, their foreign key values come from the existing rows
+        self.seeded = set()
+        # validated & set up for a run, see prepare
+        self.prepared = False
 
     def load_schema(self, filename):
         with open(filename) as f:
@@ -126,59 +242,512 @@ class DummyDB:
             self.config.add_table(table)
         return self.tables
         
-    def generate_table_data(self, table, numrows, writer : Writer):
-        self.config.validate()
+    def get_table(self, name):
+        for table in self.tables:
+            if table.name == name or table.get_name() == name:
+                return table
+        raise Exception('table [{}] - not found'.format(name))
+
+    def iter_batches(self, table, numrows=10, batch_size=None, columns=False):
+        '''
+        generate the rows of [table] (name or parsed table) lazily, [batch_size] rows at a time.
+        yields lists of row tuples, or a dict of column name -> values when [columns] is set.
+        __numrows of the table overrides [numrows], numrows=None streams rows without end.
+        foreign key parents have to be generated first, see iter_data
+        '''
+        if type(table) == str:
+            table = self.get_table(table)
+        batch_size = batch_size or self.batch_size
+        # once per run, when not part of one
+        if not self.prepared:
+            self.prepare()
         if self.seed:
             helpers.set_seed(self.seed)
-        columns = [c.name for c in table.columns]
-        writer.table(table.get_name(), columns)
-    
+        colnames = [c.name for c in table.columns]
+
         table_config = self.config.get_table(table.name)
-        if 'numrows' in table_config:
+        if numrows is not None and 'numrows' in table_config:
             numrows = int(table_config['numrows'])
+        # a negative n_distinct of the stats is a fraction of the rows
+        for colname in colnames:
+            gen = getattr(self.config.get_generator(table.name, colname), '__self__', None)
+            if isinstance(gen, StatsGenerator):
+                gen.set_rows(numrows)
+
+        batches = self.generate_batches(table, colnames, numrows, batch_size)
+        if 'cluster_by' in table_config:
+            if numrows is None:
+                eprint('warning: __cluster_by of {} ignored, the rows are streamed without end'.format(table.name))
+            else:
+                clusterer = Clusterer(colnames, table_config['cluster_by'], table_config.get('correlation', 1.0), self.sort_run_rows)
+                batches = clusterer.batches(batches, batch_size)
+        for batch in batches:
+            yield self.to_columns(colnames, batch) if columns else batch
+
+    def generate_batches(self, table, colnames, numrows, batch_size):
+        '''
+        row batches of the table in generation order, see iter_batches
+        '''
+        if self.addressable:
+            start, stop = self.row_slice(sys.maxsize if numrows is None else numrows)
+            for n in range(start, stop, batch_size):
+                yield self.addressable.rows(table.name, colnames, n, min(n + batch_size, stop))
+            return
 
         failures = 0
-        for n in range(numrows):
-            values = []
-            try:
-                row = self.datagen.row(columns, table.name)
-                writer.row(row)
-            except UniqueException as e:
-                failures += 1
-                if failures > 10:
-                    eprint('Unique failure exceeding limit .. stoppping {}'.format(table.name))
+        stop = False
+        starts = itertools.count(0, batch_size) if numrows is None else range(0, numrows, batch_size)
+        for start in starts:
+            count = batch_size if numrows is None else min(batch_size, numrows - start)
+            nulls = self.datagen.null_masks(colnames, table.name, count)
+            batch = []
+            for n in range(count):
+                try:
+                    batch.append(self.datagen.row(colnames, table.name, nulls[n]))
+                except UniqueException as e:
+                    failures += 1
+                    if failures == 1:
+                        eprint(e)
+                stop = failures > 10 or (failures > 0 and self.datagen.monitor.exhausted(table.name))
+                if stop:
                     break
-            
-        writer.table_end(table.name)
+            yield batch
+            if stop:
+                eprint('Unique failure exceeding limit .. stoppping {} after {} rows'.format(table.name, start + len(batch)))
+                break
+
+    def to_columns(self, colnames, batch):
+        if not batch:
+            return dict([(c, []) for c in colnames])
+        return dict(zip(colnames, [list(values) for values in zip(*batch)]))
+
+    def enable_addressable(self, numrows=10):
+        '''
+        switch to row addressable generation, every cell is derived from (seed, table, column, row)
+        '''
+        self.config.validate()
+        counts = {}
+        for table in self.config.data['tables']:
+            counts[table['name']] = int(table.get('numrows', numrows))
+        self.addressable = AddressableGenerator(self.config, counts, self.seed or 0)
+        # the slices of a table generated by separate runs have to agree on 'now'
+        if helpers.now is None:
+            helpers.now = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            if self.row_range or self.part:
+                eprint('relative timestamps are relative to {}, use --now to match it in other runs'.format(helpers.now))
+
+    def row_slice(self, numrows):
+        '''
+        rows of a table to generate, per the row range or the part
+        '''
+        if self.row_range:
+            return max(0, self.row_range[0]), min(numrows, self.row_range[1])
+        if self.part:
+            part, parts = self.part
+            size = (numrows + parts - 1) // parts
+            return min(numrows, part * size), min(numrows, (part + 1) * size)
+        return 0, numrows
+
+    def iter_data(self, numrows=10, batch_size=None, tablefilter=[], columns=False):
+        '''
+        generate all the tables in foreign key safe order, yields (table, batch).
+        tables outside [tablefilter] are still generated for the foreign keys, but not yielded
+        '''
+        self.prepare()
+        try:
+            for table in self.ordered_tables():
+                if self.is_filtered(table, tablefilter):
+                    # addressable foreign keys need no parent values, seeded tables have theirs
+                    if not (self.addressable or table.name in self.seeded):
+                        for batch in self.iter_batches(table, numrows, batch_size):
+                            pass
+                    continue
+                for batch in self.iter_batches(table, numrows, batch_size, columns):
+                    yield table, batch
+        finally:
+            self.prepared = False
 
-    def generate_data(self, numrows=10, writer = DumpWriter(), tablefilter=[]):
+    def ordered_tables(self):
         self.config.validate()
         order = self.config.get_safe_order()
-        debugprint('table filter:', tablefilter)
         debugprint('topo sort : ', order)
         if len(order) != len(self.tables):
             eprint(order)
             eprint('something wrong.. topo sort messed up. {}!={}'.format(len(order) , len(self.tables)))
+        return [self.tables[n] for n in order]
+
+    def is_filtered(self, table, tablefilter):
+        '''
+        true when the table is NOT in a non-empty filter
+        '''
+        return len(tablefilter) > 0 and table.name not in tablefilter and table.get_name() not in tablefilter
+
+    def generate_table_data(self, table, numrows, writer : Writer):
+        columns = [c.name for c in table.columns]
+        colinfos = [self.config.get_column(table.name, c) for c in columns]
+        writer.table(table.get_name(), columns, colinfos)
+        for batch in self.iter_batches(table, numrows):
+            writer.rows(batch)
+        writer.table_end(table.name)
+
+    def prepare(self):
+        '''
+        validate the config & set up the foreign key pools, once per run (see generate_data)
+        '''
+        self.config.validate()
+        self.configure_cache()
+        self.prepared = True
+
+    def configure_cache(self):
+        '''
+        memory limits of the foreign key pools : --fk-memory/--fk-overflow, or fk_memory/fk_overflow of the referenced column
+        '''
+        cache = helpers.cache
+        cache.memory = helpers.parse_size(self.fk_memory) if self.fk_memory else None
+        cache.overflow = self.fk_overflow
+        for table in self.config.data['tables']:
+            for column in table['columns']:
+                if column.get('is_foreignkey', False) and ('fk_memory' in column or 'fk_overflow' in column):
+                    key = helpers.COL_MAP_KEY_FMT.format(table['name'], column['name'])
+                    memory = helpers.parse_size(column['fk_memory']) if column.get('fk_memory') else None
+                    cache.limits[key] = (memory, column.get('fk_overflow'))
+
+    def sample_rows(self, count, writer=None, timings=None, counts=None):
+        '''
+        generate [count] throwaway rows per table (at most [counts] of the table) through the configured generators.
+        the foreign key cache, unique sets & generator state of the real run are left untouched.
+        the rows are handed to [writer] when given, and the seconds taken per table are set in [timings]
+        '''
+        self.config.validate()
+        saved = helpers.cache
+        helpers.cache = helpers.Cache()
+        datagen = DataGenerator(self.config)
+        samples = {}
+        if self.seed:
+            helpers.set_seed(self.seed)
+        try:
+            for n in self.config.get_safe_order():
+                table = self.tables[n]
+                columns = [c.name for c in table.columns]
+                limit = min(count, counts.get(table.name, count)) if counts else count
+                start = time.perf_counter()
+                if self.addressable:
+                    rows = self.addressable.rows(table.name, columns, 0, limit)
+                else:
+                    nulls = datagen.null_masks(columns, table.name, limit)
+                    rows = []
+                    for i in range(limit):
+                        try:
+                            rows.append(datagen.row(columns, table.name, nulls[i]))
+                        except UniqueException:
+                            break
+                if writer is not None:
+                    writer.table(table.get_name(), columns, [self.config.get_column(table.name, c) for c in columns])
+                    writer.rows(rows)
+                    writer.table_end(table.name)
+                if timings is not None:
+                    timings[table.name] = time.perf_counter() - start
+                samples[table.name] = rows
+        finally:
+            helpers.cache = saved
+            self.config.validate(force=True)
+        return samples
+
+    def row_sizes(self, samples):
+        '''
+        estimated on-disk bytes per row for every sampled table
+        '''
+        sizes = {}
+        for table in self.tables:
+            rows = samples.get(table.name, [])
+            colinfos = [self.config.get_column(table.name, c.name) for c in table.columns]
+            nbytes = sum([len(line.encode()) + 1 for line in encode_rows(get_encoders(colinfos), rows)])
+            sizes[table.name] = self.TUPLE_OVERHEAD + (nbytes / len(rows) if rows else 0)
+        return sizes
+
+    def resolve_numrows(self, numrows, scale_factor=1.0):
+        '''
+        set the row count of every table : __numrows (or numrows) scaled by [scale_factor].
+        tables with __fanout get that many rows per row of their foreign key parent
+        '''
+        counts = {}
+        for n in self.config.get_safe_order():
+            table_config = self.config.get_table(self.tables[n].name)
+            name = table_config['name']
+            base = table_config.get('basenumrows', table_config.get('numrows', numrows))
+            table_config['basenumrows'] = base
+            parents = [p for p in self.config.get_parents(name) if p in counts]
+            if 'fanout' in table_config and parents:
+                counts[name] = float(table_config['fanout']) * max([counts[p] for p in parents])
+            else:
+                if 'fanout' in table_config:
+                    eprint('no foreign parent for __fanout of {}, using numrows'.format(name))
+                counts[name] = float(base) * scale_factor
+
+        for name, count in counts.items():
+            self.config.get_table(name)['numrows'] = int(round(count))
+        return counts
+
+    def fit_target_size(self, numrows, target_bytes):
+        '''
+        scale the row counts so that the total estimated on-disk size is [target_bytes]
+        '''
+        ratios = self.resolve_numrows(numrows, 1.0)
+        sizes = self.row_sizes(self.sample_rows(self.sample_size))
+        unit = sum([ratios[name] * sizes[name] for name in ratios])
+        if unit <= 0:
+            raise Exception('unable to estimate the row sizes')
+        scale = target_bytes / unit
+        debugprint('row sizes : {}'.format(sizes))
+        eprint('target size {} : scale factor {:.4f}'.format(helpers.format_size(target_bytes), scale))
+        return self.resolve_numrows(numrows, scale)
+
+    def seed_columns(self, keys=None):
+        '''
+        table -> columns to seed. either the given table.column [keys] or by default
+        the foreign key, unique & sequence columns
+        '''
+        wanted = {}
+        for table in self.config.data['tables']:
+            unique_cols = set([col for unique in table['unique'] for col in unique])
+            for column in table['columns']:
+                key = helpers.COL_MAP_KEY_FMT.format(table['name'], column['name'])
+                if keys:
+                    selected = key in keys
+                else:
+                    selected = (column.get('is_foreignkey', False) or column['name'] in unique_cols
+                                or column.get('unique', False) or column['generator'] == 'sequence')
+                if selected:
+                    wanted.setdefault(table['name'], []).append(column['name'])
+        return wanted
+
+    def seed_pools(self, specs, keys=None):
+        '''
+        load existing values from dump files into the foreign key cache & unique sets,
+        and move sequences past the observed maximum
+        '''
+        self.prepare()
+        wanted = self.seed_columns(keys)
+        maxvalues = {}
+        count = 0
+        for spec in specs:
+            for tablename, values in loader.iter_rows(spec, self.config, wanted):
+                count += 1
+                self.seeded.add(tablename)
+                table = self.config.get_table(tablename)
+                for colname, value in values.items():
+                    if value is None:
+                        continue
+                    colcfg = self.config.get_column(tablename, colname)
+                    if colcfg.get('is_foreignkey', False):
+                        helpers.cache.add(tablename, colname, value)
+                    gen = getattr(self.config.get_generator(tablename, colname), '__self__', None)
+                    if isinstance(gen, UniqueGenerator):
+                        gen.seen.add(value)
+                    elif isinstance(gen, SequenceGenerator):
+                        try:
+                            value = int(value)
+                        except ValueError:
+                            continue
+                        key = (tablename, colname)
+                        maxvalues[key] = max(maxvalues.get(key, value), value)
+
+                for unique in table['unique']:
+                    if all([col in values for col in unique]):
+                        colvalues = dict([(col, values[col]) for col in unique])
+                        if None not in colvalues.values():
+                            self.datagen.unique_cache.add(tablename, colvalues)
+
+        for (tablename, colname), value in maxvalues.items():
+            gen = self.config.get_generator(tablename, colname).__self__
+            if gen.step > 0:
+                gen.now = max(gen.now, value + gen.step)
+            debugprint('sequence {}.{} continues at {}'.format(tablename, colname, gen.now))
+        eprint('seeded from {} existing rows'.format(count))
+
+    def follow(self, writer, rate, duration=None, numrows=10, tablefilter=[], report_interval=5.0):
+        '''
+        stream batches of the (filtered) tables without end, or for [duration] seconds,
+        paced to [rate] rows per second in total. each batch is a complete COPY/INSERT chunk.
+        tables outside the filter are generated once upfront, for the foreign keys
+        '''
+        self.prepare()
+        tables = self.ordered_tables()
+        streams = []
+        for table in tables:
+            if self.is_filtered(table, tablefilter):
+                if not (self.addressable or table.name in self.seeded):
+                    for batch in self.iter_batches(table, numrows):
+                        pass
+                continue
+            columns = [c.name for c in table.columns]
+            colinfos = [self.config.get_column(table.name, c) for c in columns]
+            streams.append((table, columns, colinfos, self.iter_batches(table, None)))
+
+        if not streams:
+            eprint('no tables to follow')
+            self.prepared = False
+            return
+
+        bucket = TokenBucket(rate, burst=max(self.batch_size, rate / 10))
+        reporter = RateReporter(rate, report_interval)
+        start = time.perf_counter()
+        try:
+            while streams and (duration is None or time.perf_counter() - start < duration):
+                # round robin over the tables, parents before children
+                for stream in list(streams):
+                    table, columns, colinfos, batches = stream
+                    batch = next(batches, None)
+                    if batch is None:
+                        # the generator gave up (eg. unique values exhausted)
+                        eprint('{} : no more rows to generate'.format(table.name))
+                        streams.remove(stream)
+                        continue
+                    if not batch:
+                        continue
+                    bucket.acquire(len(batch))
+                    t = time.perf_counter()
+                    writer.table(table.get_name(), columns, colinfos)
+                    writer.rows(batch)
+                    writer.table_end(table.name)
+                    writer.stream.flush()
+                    reporter.record(len(batch), time.perf_counter() - t)
+        except (KeyboardInterrupt, BrokenPipeError):
+            pass
+        reporter.report()
+        self.prepared = False
+
+    def run_workload(self, writer, count, mix=DEFAULT_MIX, skew='uniform', batch=1, rate=None, tablefilter=[]):
+        '''
+        write [count] UPDATE/DELETE/INSERT statements against the keys generated so far
+        '''
+        workload = Workload(self, mix, skew, batch, tablefilter)
+        bucket = TokenBucket(rate) if rate else None
+        reporter = RateReporter(rate or 0)
+        chunk = []
+        try:
+            for sql in workload.iter_statements(count):
+                chunk.append(sql)
+                if len(chunk) >= 100:
+                    if bucket:
+                        bucket.acquire(len(chunk))
+                    t = time.perf_counter()
+                    writer.statements(chunk)
+                    reporter.record(len(chunk), time.perf_counter() - t)
+                    chunk = []
+            if chunk:
+                writer.statements(chunk)
+                reporter.record(len(chunk), 0)
+        except (KeyboardInterrupt, BrokenPipeError):
+            pass
+        writer.finish()
+        reporter.report()
+
+    def generate_data(self, numrows=10, writer = DumpWriter(), tablefilter=[], skip=[]):
+        '''
+        generate the tables in [tablefilter] (all when empty). the other tables are generated
+        without output for the foreign keys, unless in [skip]
+        '''
+        self.prepare()
+        debugprint('table filter:', tablefilter)
+        tables = self.ordered_tables()
 
         # print order
-        for n in order:
-            table = self.tables[n]
+        for n, table in enumerate(tables):
             if len(tablefilter) > 0:
-                if table.name not in tablefilter and table.get_name() not in tablefilter:
+                if self.is_filtered(table, tablefilter):
                     debugprint('skipping {} .. because of filter'.format(table.get_name()))
                     continue
                 eprint('topo order:', n, table.name)
 
-        for n in order:
-            table = self.tables[n]
+        for table in tables:
             _writer = writer
-            if len(tablefilter) > 0:
-                if table.name not in tablefilter and table.get_name() not in tablefilter:
-                    debugprint('skipping {} .. because of filter'.format(table.get_name()))
-                    # Empty writer, we do this for foreign key storage..
-                    _writer= Writer()
+            if table.name in skip:
+                debugprint('skipping {} .. not needed'.format(table.get_name()))
+                continue
+            if self.is_filtered(table, tablefilter):
+                debugprint('skipping {} .. because of filter'.format(table.get_name()))
+                # addressable foreign keys need no parent values, seeded tables have theirs
+                if self.addressable or table.name in self.seeded:
+                    continue
+                # Empty writer, we do this for foreign key storage..
+                _writer= Writer()
             self.generate_table_data(table, numrows, _writer)
-            
+        writer.finish()
+        if self.summary and helpers.cache.data:
+            eprint('foreign key pools :')
+            for line in helpers.cache.report():
+                eprint('  ' + line)
+        self.prepared = False
+
+    def generate_parallel(self, dirname, jobs, numrows=10, tablefilter=[]):
+        '''
+        generate the rows in [jobs] processes, part I of every table goes to
+        [dirname]/<table or leaf partition>.I.sql. needs addressable generation
+        '''
+        if not self.addressable:
+            raise Exception('parallel generation needs addressable generation')
+        global _parallel_db
+        _parallel_db = self
+        context = multiprocessing.get_context('fork')
+        with context.Pool(jobs) as workers:
+            parts = [(part, jobs, dirname, numrows, tablefilter) for part in range(jobs)]
+            for part in workers.imap_unordered(_generate_part, parts):
+                debugprint('part {}/{} done'.format(part, jobs))
+
+    def build(self, dirname, numrows=10, jobs=1, tablefilter=[]):
+        '''
+        incremental generation into [dirname] : tables whose fingerprint (definition, config, settings
+        & foreign key parents, see build.fingerprints) is unchanged since the last build keep their files,
+        only changed tables and their foreign key descendants are generated again
+        '''
+        settings = {
+            'seed' : self.seed,
+            'numrows' : numrows,
+            'batch_size' : self.batch_size,
+            'addressable' : self.addressable is not None,
+            'row_range' : self.row_range,
+            'part' : self.part,
+            'jobs' : jobs,
+            'fk_memory' : self.fk_memory,
+            'fk_overflow' : self.fk_overflow,
+            'now' : helpers.now,
+        }
+        os.makedirs(dirname, exist_ok=True)
+        cache = BuildCache(dirname)
+        prints = fingerprints(self, settings)
+        if not self.seed:
+            eprint('warning: incremental build needs a --seed to reuse tables, generating all')
+        tables = [t for t in self.ordered_tables() if not self.is_filtered(t, tablefilter)]
+        changed = [t.name for t in tables if not (self.seed and cache.is_current(t.name, prints[t.name]))]
+        eprint('build : {} tables reused, {} to generate {}'.format(len(tables) - len(changed), len(changed), changed))
+        for name in changed:
+            cache.invalidate(name)
+        if changed:
+            if jobs > 1:
+                self.generate_parallel(dirname, jobs, numrows, changed)
+            else:
+                # parents of the changed tables are generated again (without output) for the foreign key values
+                needed = set(changed) if self.addressable else set(changed) | ancestors(self, changed)
+                skip = [t.name for t in self.tables if t.name not in needed]
+                self.generate_data(numrows, DirectoryWriter(dirname, self.config), changed, skip)
+        for table in tables:
+            if table.name in changed:
+                tablecfg = self.config.get_table(table.name)
+                cache.record(table.name, prints[table.name], cache.table_files(table, tablecfg, jobs))
+        cache.save()
+        return changed
+
+# forked into the workers of generate_parallel
+_parallel_db = None
+
+def _generate_part(job):
+    part, parts, dirname, numrows, tablefilter = job
+    dummy = _parallel_db
+    dummy.part = (part, parts)
+    dummy.generate_data(numrows, DirectoryWriter(dirname, dummy.config, '.{}'.format(part)), tablefilter)
+    return part
+
 def cli_execute(argv: Optional[str] = None):
     argv = argv or sys.argv[:]
     prog_name = Path(argv[0]).name
@@ -193,19 +762,66 @@ def cli_execute(argv: Optional[str] = None):
     parser.add_argument('-v', '--verbose', default = False, action='store_true')
     parser.add_argument('-f', '--format', dest='format', choices=['insert', 'dump'], default='dump', nargs='?', help = 'output format')
     parser.add_argument('-t', '--table', dest='tables', action='append', help = 'process only these tables')
+    parser.add_argument('--stats', dest='stats', action='append', help = 'pg_stats/pg_class export (csv/json) to configure columns from')
+    parser.add_argument('--scale-factor', dest='scale_factor', type=float, default=None, help = 'scale the row counts of all tables by this factor')
+    parser.add_argument('--target-size', dest='target_size', type=str, default=None, help = 'scale the row counts to reach this total size (eg. 50GB)')
+    parser.add_argument('--seed-from', dest='seed_from', action='append', help = 'existing data (pg_dump file or table=file.copy/.csv) to seed foreign keys & unique values from')
+    parser.add_argument('--addressable', default = False, action='store_true', help = 'derive every cell from (seed, table, column, row), no foreign key cache')
+    parser.add_argument('--row-range', dest='row_range', type=str, default=None, help = 'rows START:STOP of each table to generate (addressable)')
+    parser.add_argument('--part', dest='part', type=str, default=None, help = 'part I/N of the rows of each table to generate (addressable)')
+    parser.add_argument('--now', dest='now', type=str, default=None, help = 'reference time of relative timestamps (eg. 2024-06-01), the start of the day with --addressable')
+    parser.add_argument('--follow', default = False, action='store_true', help = 'keep streaming rows of the (-t) tables')
+    parser.add_argument('--rate', dest='rate', type=str, default=None, help = 'rows (statements) per second to stream with --follow/--workload (eg. 20000/s)')
+    parser.add_argument('--duration', dest='duration', type=str, default=None, help = 'stop --follow after this long (eg. 90s, 5m)')
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=None, help = 'rows per batch')
+    parser.add_argument('--dsn', dest='dsn', type=str, default=None, help = 'write to this database (COPY) instead of stdout, needs psycopg')
+    parser.add_argument('-o', '--output-dir', dest='output_dir', type=str, default=None, help = 'write a COPY file per table (leaf partition) to this directory')
+    parser.add_argument('--load-script', dest='load_script', default = False, action='store_true', help = 'dump as a load optimized script : COPY FREEZE per table, indexes & constraints recreated after the load')
+    parser.add_argument('--unlogged', default = False, action='store_true', help = 'with --load-script, load the tables UNLOGGED and set them LOGGED afterwards')
+    parser.add_argument('--estimate', default = False, action='store_true', help = 'estimate the time, size & memory of the run from a sample, without writing the data')
+    parser.add_argument('--incremental', default = False, action='store_true', help = 'with --output-dir, generate only the tables whose schema, config or foreign key parents changed since the last run')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=1, help = 'generate in this many processes, needs --addressable & --output-dir')
+    parser.add_argument('--fk-memory', dest='fk_memory', type=str, default=None, help = 'memory per foreign key pool (eg. 2GB), beyond it see --fk-overflow')
+    parser.add_argument('--fk-overflow', dest='fk_overflow', choices=['reservoir', 'spill'], default='spill', help = 'foreign key pool over --fk-memory : keep a reservoir sample or spill to disk')
+    parser.add_argument('--workload', dest='workload', type=int, default=0, help = 'no.of UPDATE/DELETE statements to write after the data')
+    parser.add_argument('--workload-only', dest='workload_only', default = False, action='store_true', help = 'generate the data (same --seed) but write only the workload')
+    parser.add_argument('--mix', dest='mix', type=str, default=DEFAULT_MIX, help = 'statement mix of the workload (eg. update=70,delete=20,insert=10)')
+    parser.add_argument('--skew', dest='skew', type=str, default='uniform', help = 'key distribution of the workload : uniform, zipf:S, hotspot:F,P')
+    parser.add_argument('--workload-batch', dest='workload_batch', type=int, default=1, help = 'keys per workload statement')
+    parser.add_argument('--seed-column', dest='seed_columns', action='append', help = 'table.column to seed (default: foreign key, unique & sequence columns)')
     
     args = parser.parse_args()
 
     dummy = DummyDB()
     dummy.seed = args.seed
+    dummy.summary = args.summary
+    dummy.fk_memory = args.fk_memory
+    dummy.fk_overflow = args.fk_overflow
+    helpers.seed = args.seed
+    if args.now:
+        try:
+            helpers.now = helpers.parse_time(args.now)
+        except Exception as e:
+            eprint(e)
+            sys.exit(1)
 
     if args.help_gen:
+        # the plugins of the config, there are no tables loaded yet
+        if args.config and os.path.exists(args.config):
+            dummy.config.load(args.config)
         f = dummy.config.fake
         gen = None
-        if args.help_gen in dir(f):
+        options = None
+        plugin = plugins.get(args.help_gen)
+        if plugin is not None:
+            gen = plugin.generate_batch
+            # after n, rng
+            options = list(inspect.signature(gen).parameters.values())[2:]
+        elif args.help_gen in dir(f):
             gen = getattr(f, args.help_gen)
         if gen:
-            options = inspect.signature(gen).parameters.values()
+            if options is None:
+                options = inspect.signature(gen).parameters.values()
             if len(options) > 0:
                 print('Options :: >')
                 for option in options:
@@ -236,6 +852,10 @@ def cli_execute(argv: Optional[str] = None):
         else:
             dummy.load_schema(args.schema)
 
+    if args.stats:
+        for filename in args.stats:
+            dummy.config.load_stats(filename)
+
     if args.config:
         if args.generate_config and not os.path.exists(args.config):
             pass
@@ -243,6 +863,7 @@ def cli_execute(argv: Optional[str] = None):
             dummy.config.load(args.config)
 
     if args.generate_config:
+        dummy.config.default_nulls()
         dummy.config.store(args.config)
 
     if args.numrows > 0:
@@ -250,13 +871,69 @@ def cli_execute(argv: Optional[str] = None):
             eprint('skipping row generation during conf generation ...')
         else:
             writer = None
-            if args.format == 'insert':
+            if args.dsn:
+                writer = ConnectionWriter(args.dsn, dummy.config)
+            elif args.output_dir:
+                writer = DirectoryWriter(args.output_dir, dummy.config)
+            elif args.format == 'insert':
                 writer = InsertWriter()
+            elif args.load_script:
+                names = [t.name for t in dummy.tables if not dummy.is_filtered(t, args.tables or [])]
+                writer = LoadWriter(dummy.tables, dummy.config, names, args.unlogged)
             elif args.format == 'dump':
                 writer = DumpWriter()
 
+            if args.batch_size:
+                dummy.batch_size = args.batch_size
+
+            if args.target_size:
+                dummy.fit_target_size(args.numrows, helpers.parse_size(args.target_size))
+            else:
+                # also applies __fanout
+                dummy.resolve_numrows(args.numrows, args.scale_factor or 1.0)
+
+            if args.seed_from:
+                dummy.seed_pools(args.seed_from, args.seed_columns)
+
+            if (args.row_range or args.part) and not args.addressable:
+                eprint('--row-range/--part need --addressable')
+                sys.exit(1)
+            if args.incremental and not args.output_dir:
+                eprint('--incremental needs --output-dir')
+                sys.exit(1)
+            if args.jobs > 1 and not (args.addressable and args.output_dir):
+                eprint('--jobs needs --addressable and --output-dir')
+                sys.exit(1)
+            if args.addressable:
+                try:
+                    if args.row_range:
+                        dummy.row_range = helpers.parse_row_range(args.row_range)
+                    if args.part:
+                        dummy.part = helpers.parse_part(args.part)
+                except Exception as e:
+                    eprint(e)
+                    sys.exit(1)
+                dummy.enable_addressable(args.numrows)
+
             tablefilter = args.tables if args.tables else []
-            dummy.generate_data(numrows = args.numrows, writer = writer, tablefilter = tablefilter)
+            rate = helpers.parse_rate(args.rate) if args.rate else None
+            if args.estimate:
+                Estimate(dummy, args.numrows).run(InsertWriter() if args.format == 'insert' else DumpWriter()).report(args.jobs)
+            elif args.follow:
+                duration = helpers.parse_duration(args.duration) if args.duration else None
+                dummy.follow(writer, rate or 1000, duration, numrows = args.numrows, tablefilter = tablefilter)
+            elif args.workload > 0:
+                if args.addressable:
+                    eprint('--workload needs the keys tracked while generating, not possible with --addressable')
+                    sys.exit(1)
+                dummy.generate_data(numrows = args.numrows, writer = Writer() if args.workload_only else writer)
+                dummy.run_workload(writer, args.workload, args.mix, args.skew, args.workload_batch, rate, tablefilter)
+            elif args.incremental:
+                dummy.build(args.output_dir, numrows = args.numrows, jobs = args.jobs, tablefilter = tablefilter)
+            elif args.jobs > 1:
+                dummy.generate_parallel(args.output_dir, args.jobs, numrows = args.numrows, tablefilter = tablefilter)
+            else:
+                dummy.generate_data(numrows = args.numrows, writer = writer, tablefilter = tablefilter)
 
 if __name__ == '__main__':
     cli_execute()
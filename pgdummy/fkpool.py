@@ -0,0 +1,172 @@
+import hashlib
+import mmap
+import pickle
+import random
+import tempfile
+from array import array
+
+from . import helpers
+
+# ways to bound a pool over its memory limit
+OVERFLOW_MODES = ['reservoir', 'spill']
+# list slot + set entry of a value kept in memory
+ENTRY_SIZE = 48
+# values buffered in memory before they're appended to the spill files
+SPILL_BUFFER = 10000
+
+class BloomFilter:
+    '''
+    membership of pickled values in [nbytes], without false negatives : a value added before is
+    always found, a new one is mistaken for a known one now and then (more often as it fills up)
+    '''
+    HASHES = 3
+
+    def __init__(self, nbytes):
+        self.bits = bytearray(max(1, nbytes))
+        self.size = len(self.bits) * 8
+
+    def add(self, data):
+        '''
+        add [data], true when it was (probably) added before
+        '''
+        digest = hashlib.blake2b(data, digest_size=8 * self.HASHES).digest()
+        found = True
+        for n in range(self.HASHES):
+            i = int.from_bytes(digest[8 * n:8 * n + 8], 'little') % self.size
+            mask = 1 << (i & 7)
+            if not self.bits[i >> 3] & mask:
+                found = False
+                self.bits[i >> 3] |= mask
+        return found
+
+class SpillStore:
+    '''
+    append only array of values on disk : pickled values in one file, their end offsets in another.
+    both are memory mapped for sampling by index, the latest (pickled) values are served from the buffer
+    '''
+    def __init__(self, dirname=None):
+        self.data = tempfile.TemporaryFile(dir=dirname)
+        self.offsets = tempfile.TemporaryFile(dir=dirname)
+        self.buffer = []
+        self.flushed = 0
+        self.pos = 0
+        self.mapped = 0
+        self.data_map = None
+        self.offset_map = None
+
+    def __len__(self):
+        return self.flushed + len(self.buffer)
+
+    @property
+    def nbytes(self):
+        return self.pos + 8 * self.flushed
+
+    def add(self, data):
+        '''
+        add a pickled value
+        '''
+        self.buffer.append(data)
+        if len(self.buffer) >= SPILL_BUFFER:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        ends = array('Q')
+        for data in self.buffer:
+            self.data.write(data)
+            self.pos += len(data)
+            ends.append(self.pos)
+        self.offsets.write(ends.tobytes())
+        self.flushed += len(self.buffer)
+        self.buffer = []
+
+    def remap(self):
+        self.data.flush()
+        self.offsets.flush()
+        self.data_map = mmap.mmap(self.data.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offset_map = memoryview(mmap.mmap(self.offsets.fileno(), 0, access=mmap.ACCESS_READ)).cast('Q')
+        self.mapped = self.flushed
+
+    def get(self, i):
+        if i >= self.flushed:
+            return pickle.loads(self.buffer[i - self.flushed])
+        if i >= self.mapped:
+            self.remap()
+        start = self.offset_map[i - 1] if i > 0 else 0
+        return pickle.loads(self.data_map[start:self.offset_map[i]])
+
+class ValuePool:
+    '''
+    values of a referenced column, sampled by index in insertion order (deterministic for a seed).
+    the values are distinct while in memory. beyond [limit] bytes, [overflow] decides :
+    reservoir - keep a uniform sample of the values seen so far, of the size reached at the limit.
+    the sample is drawn from its own generator seeded with [seed], the values generated stay the same
+    spill - move the values to a SpillStore. duplicates are dropped by a BloomFilter of [limit] bytes,
+    which leaves out some of the distinct values once it fills up
+    '''
+    def __init__(self, limit=None, overflow='spill', spill_dir=None, seed=None):
+        if overflow not in OVERFLOW_MODES:
+            raise Exception('invalid overflow : {}, should be one of {}'.format(overflow, OVERFLOW_MODES))
+        self.limit = limit
+        self.overflow = overflow
+        self.spill_dir = spill_dir
+        self.values = []
+        self.seen = set()
+        self.memory = 0
+        # values offered, for the reservoir
+        self.offered = 0
+        self.store = None
+        self.filter = None
+        self.bounded = False
+        self.random = random.Random(seed)
+
+    def __len__(self):
+        return len(self.store) if self.store is not None else len(self.values)
+
+    def add(self, value):
+        if self.store is not None:
+            self.spill(value)
+            return
+        if value in self.seen:
+            return
+        self.offered += 1
+        if self.bounded:
+            # reservoir sampling (algorithm R)
+            i = self.random.randrange(self.offered)
+            if i < len(self.values):
+                self.seen.discard(self.values[i])
+                self.values[i] = value
+                self.seen.add(value)
+            return
+        self.values.append(value)
+        self.seen.add(value)
+        self.memory += helpers.value_size(value) + ENTRY_SIZE
+        if self.limit is not None and self.memory > self.limit:
+            self.bound()
+
+    def bound(self):
+        if self.overflow == 'reservoir':
+            self.bounded = True
+            return
+        self.store = SpillStore(self.spill_dir)
+        self.filter = BloomFilter(self.limit)
+        for value in self.values:
+            self.spill(value)
+        self.values = []
+        self.seen = set()
+        self.memory = len(self.filter.bits)
+
+    def spill(self, value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if not self.filter.add(data):
+            self.store.add(data)
+
+    def sample(self, rng):
+        count = len(self)
+        if count == 0:
+            return None
+        i = rng.randrange(count)
+        if self.store is not None:
+            return self.store.get(i)
+        return self.values[i]
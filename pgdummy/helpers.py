@@ -1,9 +1,15 @@
 import sys
+from datetime import datetime
 from faker import Faker
 
+from . import fkpool
+
 COL_MAP_KEY_FMT = '{}.{}'
 debug = False
 fake = Faker()
+seed = None
+# reference time of the relative timestamps (eg. -30d), the current time when None
+now = None
 
 def debugprint(*args, **kwargs):
     if debug:
@@ -12,23 +18,141 @@ def debugprint(*args, **kwargs):
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
-def set_seed(seed):
-    Faker.seed(seed)
+def set_seed(value):
+    global seed
+    seed = value
+    Faker.seed(value)
+
+SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+def parse_size(size):
+    '''
+    convert a size like 500MB, 1.5G, 50GB to bytes
+    '''
+    s = str(size).strip().upper()
+    if s.endswith('B'):
+        s = s[:-1]
+    unit = s[-1:] if s[-1:] in SIZE_UNITS else ''
+    try:
+        value = float(s[:len(s) - len(unit)])
+    except ValueError:
+        raise Exception('invalid size : {}'.format(size))
+    return int(value * SIZE_UNITS[unit])
+
+TIME_UNITS = {'': 1, 'S': 1, 'M': 60, 'H': 3600, 'D': 86400}
+
+def parse_duration(duration):
+    '''
+    convert a duration like 90, 90s, 5m, 1.5h to seconds
+    '''
+    s = str(duration).strip().upper()
+    unit = s[-1:] if s[-1:] in TIME_UNITS else ''
+    try:
+        return float(s[:len(s) - len(unit)]) * TIME_UNITS[unit]
+    except ValueError:
+        raise Exception('invalid duration : {}'.format(duration))
+
+def parse_rate(rate):
+    '''
+    convert a rate like 20000/s, 1000/m, 500 to rows per second
+    '''
+    s = str(rate).strip()
+    count, _, per = s.partition('/')
+    try:
+        return float(count) / parse_duration('1' + per if per[:1].isalpha() else per or '1')
+    except (ValueError, ZeroDivisionError):
+        raise Exception('invalid rate : {}'.format(rate))
+
+def parse_time(value):
+    '''
+    convert a time like 2024-06-01, 2024-06-01 12:00:00 to a datetime
+    '''
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise Exception('invalid time : {}'.format(value))
+
+def parse_row_range(rows):
+    '''
+    convert a row range START:STOP (either can be left out) to (start, stop)
+    '''
+    try:
+        start, stop = str(rows).split(':')
+        start, stop = int(start or 0), int(stop) if stop else sys.maxsize
+    except ValueError:
+        raise Exception('invalid row range : {}, should be START:STOP'.format(rows))
+    if start < 0 or stop < start:
+        raise Exception('invalid row range : {}, should be 0 <= START <= STOP'.format(rows))
+    return start, stop
+
+def parse_part(part):
+    '''
+    convert a part I/N to (I, N)
+    '''
+    try:
+        i, n = [int(p) for p in str(part).split('/')]
+    except ValueError:
+        raise Exception('invalid part : {}, should be I/N'.format(part))
+    if n <= 0 or not 0 <= i < n:
+        raise Exception('invalid part : {}, should be I/N with 0 <= I < N'.format(part))
+    return i, n
+
+def format_size(nbytes):
+    for unit in ['', 'K', 'M', 'G']:
+        if abs(nbytes) < 1024:
+            return '{:.1f}{}B'.format(nbytes, unit)
+        nbytes /= 1024.0
+    return '{:.1f}TB'.format(nbytes)
+
+def value_size(value):
+    '''
+    bytes of a value in memory, with the items of a tuple
+    '''
+    if type(value) == tuple:
+        return sys.getsizeof(value) + sum([sys.getsizeof(v) for v in value])
+    return sys.getsizeof(value)
 
 class Cache:
-    def __init__(self):
+    '''
+    values of the referenced (foreign key) columns, see fkpool.ValuePool. a pool over
+    [memory] bytes keeps a reservoir sample or spills to disk, as set by [overflow].
+    per column overrides in limits : table.column -> (memory, overflow)
+    '''
+    def __init__(self, memory=None, overflow='spill', spill_dir=None):
         self.data = {}
+        self.memory = memory
+        self.overflow = overflow
+        self.spill_dir = spill_dir
+        self.limits = {}
+
+    def pool(self, key):
+        pool = self.data.get(key)
+        if pool is None:
+            memory, overflow = self.limits.get(key, (None, None))
+            # the reservoir has a generator of its own, seeded per column
+            pool = self.data[key] = fkpool.ValuePool(memory or self.memory, overflow or self.overflow, self.spill_dir,
+                '{}:{}'.format(seed, key))
+        return pool
 
     def add(self, tablename, columnname, value):
-        key = '{}.{}'.format(tablename, columnname)
-        items = self.data.setdefault(key, set())
-        items.add(value)
+        self.pool(COL_MAP_KEY_FMT.format(tablename, columnname)).add(value)
 
     def get(self, key):
-        items = self.data.setdefault(key, set())
-        if len(items) == 0:
-            return None
-        return fake.random_element(items)
+        return self.pool(key).sample(fake.random)
+
+    def report(self):
+        '''
+        memory (and disk) used by the pool of every column
+        '''
+        lines = []
+        for key, pool in sorted(self.data.items()):
+            line = '{} : {} values, {} in memory'.format(key, len(pool), format_size(pool.memory))
+            if pool.store is not None:
+                line += ', {} spilled to disk'.format(format_size(pool.store.nbytes))
+            elif pool.bounded:
+                line += ', reservoir of {} values seen'.format(pool.offered)
+            lines.append(line)
+        return lines
 
 cache = Cache()
 
@@ -0,0 +1,141 @@
+import csv
+import gzip
+import os.path
+import re
+
+from .encoders import BOOL_TYPES, FLOAT_TYPES, INT_TYPES
+from .helpers import debugprint, eprint
+
+COPY_RE = re.compile(r'^COPY\s+(.+?)\s*\((.*)\)\s+FROM\s+stdin', re.IGNORECASE)
+UNESCAPE_RE = re.compile(r'\\(?:([0-7]{1,3})|x([0-9a-fA-F]{1,2})|(.))')
+UNESCAPE_CHARS = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+
+def _unescape_match(m):
+    if m.group(1):
+        return chr(int(m.group(1), 8))
+    if m.group(2):
+        return chr(int(m.group(2), 16))
+    return UNESCAPE_CHARS.get(m.group(3), m.group(3))
+
+def unescape(field):
+    '''
+    decode a COPY text format field
+    '''
+    if field == '\\N':
+        return None
+    if '\\' not in field:
+        return field
+    return UNESCAPE_RE.sub(_unescape_match, field)
+
+def unquote(name):
+    name = name.strip()
+    if name.startswith('"') and name.endswith('"'):
+        return name[1:-1].replace('""', '"')
+    return name
+
+def open_file(filename):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt')
+    return open(filename, 'r')
+
+def iter_dump(fp, wanted):
+    '''
+    stream the COPY sections of a pg_dump (plain format) or pgdummy output.
+    [wanted] maps table name -> list of columns, yields (table, {column: raw value})
+    '''
+    columns = None
+    for line in fp:
+        if columns is None:
+            m = COPY_RE.match(line)
+            if m is None:
+                continue
+            table = unquote(m.group(1).split('.')[-1])
+            if table not in wanted:
+                # skip over the data
+                columns = []
+                continue
+            names = [unquote(c) for c in m.group(2).split(',')]
+            columns = [(names.index(c), c) for c in wanted[table] if c in names]
+            debugprint('seeding from COPY {} {}'.format(table, [c for _, c in columns]))
+            continue
+
+        line = line.rstrip('\n')
+        if line == '\\.':
+            columns = None
+            continue
+        if not columns:
+            continue
+        fields = line.split('\t')
+        yield table, dict([(c, unescape(fields[i])) for i, c in columns])
+
+def iter_copy(fp, table, names, wanted):
+    '''
+    stream a COPY text file (no header) of a single table
+    '''
+    columns = [(names.index(c), c) for c in wanted if c in names]
+    for line in fp:
+        line = line.rstrip('\n')
+        if line == '\\.':
+            break
+        fields = line.split('\t')
+        yield table, dict([(c, unescape(fields[i])) for i, c in columns])
+
+def iter_csv(fp, table, wanted):
+    '''
+    stream a CSV file with a header of a single table, empty fields are NULL
+    '''
+    reader = csv.reader(fp)
+    names = next(reader, [])
+    columns = [(names.index(c), c) for c in wanted if c in names]
+    for fields in reader:
+        yield table, dict([(c, fields[i] if fields[i] != '' else None) for i, c in columns])
+
+def convert(value, typename):
+    '''
+    convert a text value back to the python type the generators produce
+    '''
+    if value is None:
+        return None
+    try:
+        if typename in INT_TYPES:
+            return int(value)
+        if typename in FLOAT_TYPES:
+            return float(value)
+    except ValueError:
+        return value
+    if typename in BOOL_TYPES:
+        return value in ['t', 'true', 'TRUE', 'True', '1']
+    return value
+
+def iter_rows(spec, config, wanted):
+    '''
+    [spec] is either a dump file or table=file (COPY text or .csv) of a single table.
+    yields (table, {column: value}) with the values converted per the column type
+    '''
+    table = None
+    filename = spec
+    if '=' in spec and not os.path.exists(spec):
+        table, filename = spec.split('=', 1)
+
+    if not os.path.exists(filename):
+        eprint('seed file NOT FOUND : {}'.format(filename))
+        return
+
+    with open_file(filename) as fp:
+        if table is None:
+            rows = iter_dump(fp, wanted)
+        elif filename.endswith('.csv') or filename.endswith('.csv.gz'):
+            rows = iter_csv(fp, table, wanted.get(table, []))
+        else:
+            tconfig = config.get_table(table)
+            if tconfig is None:
+                eprint('table {} of seed file {} - NOT FOUND'.format(table, filename))
+                return
+            names = [c['name'] for c in tconfig['columns']]
+            rows = iter_copy(fp, table, names, wanted.get(table, []))
+
+        for tablename, values in rows:
+            for colname in values:
+                colcfg = config.get_column(tablename, colname)
+                values[colname] = convert(values[colname], colcfg['type'] if colcfg else None)
+            yield tablename, values
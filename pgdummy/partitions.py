@@ -0,0 +1,229 @@
+import bisect
+import functools
+from datetime import datetime, timedelta
+
+from . import helpers
+from .encoders import FLOAT_TYPES, INT_TYPES
+from .helpers import debugprint, eprint
+
+@functools.total_ordering
+class Infinite:
+    '''
+    MINVALUE/MAXVALUE of a range bound, compares below/above any value
+    '''
+    def __init__(self, sign, name):
+        self.sign = sign
+        self.name = name
+
+    def __eq__(self, other):
+        return self is other
+
+    def __lt__(self, other):
+        return self.sign < 0 and other is not self
+
+    def __hash__(self):
+        return id(self)
+
+    def __repr__(self):
+        return self.name
+
+MINVALUE = Infinite(-1, 'MINVALUE')
+MAXVALUE = Infinite(1, 'MAXVALUE')
+
+def convert(value, typename):
+    '''
+    bound value as generated for a column of [typename]
+    '''
+    if value is None:
+        return None
+    if value == 'MINVALUE':
+        return MINVALUE
+    if value == 'MAXVALUE':
+        return MAXVALUE
+    if typename in INT_TYPES:
+        return int(value)
+    if typename in FLOAT_TYPES:
+        return float(value)
+    return str(value)
+
+def leaf_name(table, partition):
+    schema = partition.get('schema') or table.get('schema')
+    return '{}{}'.format('' if schema is None else '{}.'.format(schema), partition['name'])
+
+def is_partitioned(table):
+    return bool(table and table.get('partition_by') and table.get('partitions'))
+
+class Router:
+    '''
+    leaf partition of a row of the [table] config, None when the row stays with the parent :
+    hash partitions (postgres' hash functions are not replicated) or rows without a partition
+    '''
+    def __init__(self, table, colnames=None):
+        spec = table['partition_by']
+        self.strategy = spec['strategy']
+        self.columns = spec['columns']
+        types = dict([(c['name'], c.get('type')) for c in table['columns']])
+        self.types = [types.get(c) for c in self.columns]
+        self.index = [colnames.index(c) for c in self.columns] if colnames else None
+        self.default = None
+        # range : sorted lower bounds -> (upper bound, leaf)
+        self.lowers = []
+        self.ranges = []
+        # list : value -> leaf
+        self.values = {}
+        self.leaves = []
+
+        entries = []
+        for partition in table['partitions']:
+            name = leaf_name(table, partition)
+            bound = partition['bound']
+            if bound.get('default', False):
+                self.default = name
+                continue
+            self.leaves.append((name, bound))
+            if self.strategy == 'range':
+                entries.append((self.bound(bound['from']), self.bound(bound['to']), name))
+            elif self.strategy == 'list':
+                for value in bound['values']:
+                    self.values[convert(value, self.types[0])] = name
+        entries.sort(key=lambda e: e[0])
+        self.lowers = [e[0] for e in entries]
+        self.ranges = [(e[1], e[2]) for e in entries]
+
+    def bound(self, values):
+        return tuple([convert(v, t) for v, t in zip(values, self.types)])
+
+    def route(self, key):
+        '''
+        leaf of a partition key tuple
+        '''
+        if self.strategy == 'range':
+            if None in key:
+                return self.default
+            pos = bisect.bisect_right(self.lowers, key) - 1
+            if pos >= 0 and key < self.ranges[pos][0]:
+                return self.ranges[pos][1]
+            return self.default
+        if self.strategy == 'list':
+            return self.values.get(key[0], self.default)
+        return None
+
+    def split(self, rows):
+        '''
+        rows grouped by leaf (None for the parent), in order of appearance
+        '''
+        groups = {}
+        index = self.index
+        for row in rows:
+            leaf = self.route(tuple([row[i] for i in index]))
+            group = groups.get(leaf)
+            if group is None:
+                group = groups[leaf] = []
+            group.append(row)
+        return groups
+
+def get_router(config, tablename, colnames):
+    '''
+    router of a (schema qualified) table when it's partitioned, else None
+    '''
+    if config is None:
+        return None
+    table = config.get_table(tablename.split('.')[-1])
+    if not is_partitioned(table):
+        return None
+    return Router(table, colnames)
+
+DATE_FORMAT = '%Y-%m-%d'
+
+def parse_time(value):
+    return datetime.fromisoformat(str(value).strip())
+
+class PartitionKeyGenerator:
+    '''
+    values of a partition key column spread evenly over [count] leaf partitions :
+    the target leaves take turns and a value is drawn within the bounds of the leaf.
+    values the bounds can't be sampled from (unbounded/default leaves, other types)
+    are drawn from [fn] until they route to the leaf
+    '''
+    MAX_ATTEMPTS = 100
+
+    def __init__(self, table, colcfg, fn, count, cycle=True):
+        self.router = Router(table)
+        self.colcfg = colcfg
+        self.fn = fn
+        self.cycle = cycle
+        self.counter = 0
+        leaves = [name for name, _ in self.router.leaves]
+        if self.router.strategy == 'range':
+            leaves = [name for _, name in self.router.ranges]
+        if not leaves and self.router.default:
+            leaves = [self.router.default]
+        count = max(1, min(int(count), len(leaves)))
+        # spread the targets over the (ordered) leaves
+        self.targets = [leaves[n * len(leaves) // count] for n in range(count)]
+        self.bounds = dict([(name, bound) for name, bound in self.router.leaves])
+        self.positions = dict([(name, pos) for pos, (_, name) in enumerate(self.router.ranges)])
+        debugprint('partition targets {}.{} : {}'.format(table['name'], colcfg['name'], self.targets))
+
+    def within(self, leaf):
+        router = self.router
+        typename = router.types[0]
+        if router.strategy == 'list':
+            values = [convert(v, typename) for v in self.bounds[leaf]['values'] if v is not None]
+            return helpers.fake.random.choice(values) if values else None
+        pos = self.positions[leaf]
+        lower = router.lowers[pos][0]
+        upper = router.ranges[pos][0][0]
+        if isinstance(lower, Infinite) or isinstance(upper, Infinite):
+            return None
+        random = helpers.fake.random
+        if typename in INT_TYPES:
+            return random.randrange(lower, upper) if upper > lower else None
+        if typename in FLOAT_TYPES:
+            return lower + random.random() * (upper - lower)
+        if typename in ['date', 'timestamp', 'timestamptz']:
+            start, stop = parse_time(lower), parse_time(upper)
+            if typename == 'date':
+                days = (stop - start).days
+                value = start + timedelta(days=random.randrange(days)) if days > 0 else None
+            else:
+                seconds = int((stop - start).total_seconds())
+                value = start + timedelta(seconds=random.randrange(seconds)) if seconds > 0 else None
+            if value is None:
+                return None
+            return value.strftime(self.colcfg.get('format', DATE_FORMAT if typename == 'date' else '%Y-%m-%d %H:%M:%S'))
+        return None
+
+    def next(self):
+        if self.cycle:
+            leaf = self.targets[self.counter % len(self.targets)]
+            self.counter += 1
+        else:
+            leaf = self.targets[helpers.fake.random.randrange(len(self.targets))]
+        value = None
+        if leaf in self.bounds:
+            value = self.within(leaf)
+        if value is not None:
+            return value
+        for n in range(self.MAX_ATTEMPTS):
+            value = self.fn()
+            if self.router.route((value,)) == leaf:
+                return value
+        return value
+
+def partition_key_generator(table, colcfg, fn, cycle=True):
+    '''
+    wrap the generator of a column to fill __partitions leaves evenly, when the column is the partition key
+    '''
+    if not is_partitioned(table) or not table.get('fill_partitions'):
+        return fn
+    spec = table['partition_by']
+    if colcfg['name'] not in spec['columns']:
+        return fn
+    if spec['strategy'] == 'hash':
+        eprint('warning: __partitions of {} ignored, hash partitions can not be targeted'.format(table['name']))
+        return fn
+    if len(spec['columns']) > 1:
+        eprint('warning: __partitions of {} ignored, only single column partition keys can be targeted'.format(table['name']))
+        return fn
+    return PartitionKeyGenerator(table, colcfg, fn, table['fill_partitions'], cycle).next
@@ -0,0 +1,177 @@
+import functools
+import string
+
+from .blobs import random_bytes
+
+# placeholders of the string pattern (faker's bothify) -> the choices of a character
+PLACEHOLDERS = {
+    '#' : list(string.digits),
+    '%' : list(string.digits[1:]),
+    '$' : list(string.digits[2:]),
+    # a digit or nothing, half the time each
+    '!' : [''] * 10 + list(string.digits),
+    '@' : [''] * 9 + list(string.digits[1:]),
+}
+HEX_DIGITS = '0123456789abcdef'
+
+class Segment:
+    '''
+    literal [text], or a run of [count] placeholders drawing from [choices]
+    '''
+    def __init__(self, text=None, choices=None, count=1):
+        self.text = text
+        self.choices = choices
+        self.count = count
+        self.table = None
+        # a power of 2 of single byte choices : a random byte maps to an unbiased choice
+        if choices and all([len(c) == 1 and ord(c) < 128 for c in choices]):
+            size = len(choices)
+            if size & (size - 1) == 0 and size <= 256:
+                self.table = bytes([ord(choices[i % size]) for i in range(256)])
+
+    def draw(self, rng, n):
+        '''
+        the text of this segment for [n] values
+        '''
+        if self.choices is None:
+            return [self.text] * n
+        m = self.count
+        total = n * m
+        if self.table is not None:
+            drawn = random_bytes(rng, total).translate(self.table).decode('ascii')
+            return [drawn[i:i + m] for i in range(0, total, m)]
+        drawn = rng.choices(self.choices, k=total)
+        if m == 1:
+            return drawn
+        return [''.join(drawn[i:i + m]) for i in range(0, total, m)]
+
+class Pattern:
+    '''
+    a pattern parsed once into segments. values are generated a batch at a time, each run
+    of placeholders from one bulk draw. [domain] is the no.of values the pattern can take,
+    [exact] when every combination of the placeholders gives a different value
+    '''
+    def __init__(self, segments):
+        self.segments = segments
+        self.placeholders = []
+        for segment in segments:
+            if segment.choices is not None:
+                alphabet = sorted(set(segment.choices))
+                self.placeholders.extend([alphabet] * segment.count)
+        self.exact = all(['' not in alphabet for alphabet in self.placeholders])
+        self.domain = 1
+        for alphabet in self.placeholders:
+            self.domain *= len(alphabet)
+
+    def generate_batch(self, n, rng):
+        pieces = [segment.draw(rng, n) for segment in self.segments]
+        return [''.join(parts) for parts in zip(*pieces)]
+
+    def value(self, index):
+        '''
+        the [index]-th (0 to domain - 1) value, placeholders as the digits of a mixed radix number
+        '''
+        chars = []
+        for alphabet in reversed(self.placeholders):
+            index, digit = divmod(index, len(alphabet))
+            chars.append(alphabet[digit])
+        chars.reverse()
+        parts = []
+        pos = 0
+        for segment in self.segments:
+            if segment.choices is None:
+                parts.append(segment.text)
+            else:
+                parts.append(''.join(chars[pos:pos + segment.count]))
+                pos += segment.count
+        return ''.join(parts)
+
+def parse(pattern, placeholders):
+    '''
+    segments of the [pattern] : runs of the same placeholder and the literal text between them
+    '''
+    segments = []
+    literal = []
+    for ch in pattern:
+        choices = placeholders.get(ch)
+        if choices is None:
+            literal.append(ch)
+            continue
+        if literal:
+            segments.append(Segment(text=''.join(literal)))
+            literal = []
+        last = segments[-1] if segments else None
+        if last is not None and last.choices is choices:
+            last.count += 1
+        else:
+            segments.append(Segment(choices=choices))
+    if literal:
+        segments.append(Segment(text=''.join(literal)))
+    return segments
+
+def compile_string(pattern, letters=string.ascii_uppercase):
+    '''
+    pattern of the string generator : # % $ ! @ digits (see faker's numerify) and ? from [letters],
+    a string or a list (from the yaml config) made a tuple for the cache
+    '''
+    if not isinstance(letters, str):
+        letters = tuple(letters)
+    return _compile_string(pattern, letters)
+
+@functools.lru_cache(maxsize=256)
+def _compile_string(pattern, letters):
+    placeholders = dict(PLACEHOLDERS)
+    placeholders['?'] = list(letters)
+    return Pattern(parse(pattern, placeholders))
+
+@functools.lru_cache(maxsize=256)
+def compile_hex(pattern='^^^^^^^'):
+    '''
+    pattern of the hex generator : ^ is a lower case hex digit
+    '''
+    return Pattern(parse(pattern, {'^' : list(HEX_DIGITS)}))
+
+def column_pattern(coldata):
+    '''
+    compiled pattern of a string (with a pattern) or hex column, else None
+    '''
+    generator = coldata.get('generator')
+    if generator == 'string' and coldata.get('pattern'):
+        return compile_string(coldata['pattern'], coldata.get('letters', string.ascii_uppercase))
+    if generator == 'hex':
+        return compile_hex(coldata.get('pattern', '^^^^^^^'))
+    return None
+
+MASK64 = (1 << 64) - 1
+
+def mix(x, key):
+    x = ((x ^ key) * 0x9E3779B97F4A7C15) & MASK64
+    x ^= x >> 29
+    x = (x * 0xBF58476D1CE4E5B9) & MASK64
+    return x ^ (x >> 32)
+
+class Permutation:
+    '''
+    pseudo random permutation of 0 .. [size] - 1 : a feistel network over the smallest even
+    no.of bits covering size, keyed from [rng], walking the cycle until the result is in range
+    '''
+    ROUNDS = 4
+
+    def __init__(self, size, rng):
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        self.half = (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
+        self.keys = [rng.getrandbits(64) for n in range(self.ROUNDS)]
+
+    def encrypt(self, x):
+        left, right = x >> self.half, x & self.mask
+        for key in self.keys:
+            left, right = right, left ^ (mix(right, key) & self.mask)
+        return (left << self.half) | right
+
+    def get(self, i):
+        x = self.encrypt(i)
+        while x >= self.size:
+            x = self.encrypt(x)
+        return x
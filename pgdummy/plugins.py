@@ -0,0 +1,113 @@
+import importlib
+import inspect
+
+from . import helpers
+from .helpers import debugprint, eprint
+
+# entry point group of the generator plugins
+ENTRY_POINT_GROUP = 'pgdummy.generators'
+
+# name -> plugin, an object with generate_batch(n, rng, **options)
+# and optionally domain_size(**options) (or a number)
+PLUGINS = {}
+loaded = False
+
+def register(name, plugin):
+    '''
+    register a generator plugin (object, class or module) under [name]
+    '''
+    if inspect.isclass(plugin):
+        plugin = plugin()
+    if not hasattr(plugin, 'generate_batch'):
+        raise Exception('generator plugin [{}] has no generate_batch(n, rng, **options)'.format(name))
+    PLUGINS[name] = plugin
+    debugprint('generator plugin : {} -> {}'.format(name, plugin))
+    return plugin
+
+def load_spec(spec):
+    '''
+    plugin object of a 'package.module:attribute' spec
+    '''
+    module, _, attr = spec.partition(':')
+    obj = importlib.import_module(module.strip())
+    for part in [a for a in attr.strip().split('.') if a]:
+        obj = getattr(obj, part)
+    return obj
+
+def load_config(plugins):
+    '''
+    plugins of the config : {name: 'module:attribute'} or ['module:attribute'] (named after the attribute)
+    '''
+    if isinstance(plugins, dict):
+        items = list(plugins.items())
+    else:
+        items = [(getattr(load_spec(spec), 'name', spec.split(':')[-1].split('.')[-1]), spec) for spec in plugins]
+    for name, spec in items:
+        register(name, load_spec(spec))
+
+def load_entry_points():
+    global loaded
+    if loaded:
+        return
+    loaded = True
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return
+    eps = entry_points()
+    group = eps.select(group=ENTRY_POINT_GROUP) if hasattr(eps, 'select') else eps.get(ENTRY_POINT_GROUP, [])
+    for ep in group:
+        if ep.name in PLUGINS:
+            continue
+        try:
+            register(ep.name, ep.load())
+        except Exception as e:
+            eprint('unable to load generator plugin [{}] : {}'.format(ep.name, e))
+
+def get(name):
+    if name not in PLUGINS:
+        load_entry_points()
+    return PLUGINS.get(name, None)
+
+def plugin_options(plugin, coldata, reserved):
+    '''
+    column options accepted by generate_batch : the named ones, or all (except [reserved]) with **options
+    '''
+    params = list(inspect.signature(plugin.generate_batch).parameters.values())[2:]
+    if any([p.kind == inspect.Parameter.VAR_KEYWORD for p in params]):
+        return dict([(k, v) for k, v in coldata.items() if k not in reserved])
+    names = [p.name for p in params]
+    return dict([(k, v) for k, v in coldata.items() if k in names])
+
+def domain_size(plugin, options):
+    '''
+    no.of distinct values the plugin can generate with the [options], None when unknown
+    '''
+    size = getattr(plugin, 'domain_size', None)
+    if callable(size):
+        size = size(**options)
+    return int(size) if size is not None else None
+
+class BatchGenerator:
+    '''
+    values of a plugin one at a time, generated [batch_size] at once. with batch_size=1
+    every value is drawn on its own, as needed by the row addressable generation
+    '''
+    batch_size = 1000
+
+    def __init__(self, plugin, options, batch_size=None):
+        self.plugin = plugin
+        self.options = options
+        self.batch_size = batch_size or self.batch_size
+        self.values = []
+        self.pos = 0
+
+    def next(self):
+        if self.pos >= len(self.values):
+            self.values = self.plugin.generate_batch(self.batch_size, helpers.fake.random, **self.options)
+            self.pos = 0
+            if not self.values:
+                raise Exception('generator plugin {} returned no values'.format(self.plugin))
+        value = self.values[self.pos]
+        self.pos += 1
+        return value
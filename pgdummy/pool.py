@@ -0,0 +1,119 @@
+import hashlib
+import json
+import mmap
+import os
+import os.path
+import struct
+import tempfile
+from array import array
+
+from . import helpers
+from .blobs import LargeValue
+from .helpers import debugprint, eprint
+
+# magic, no.of values, position of the offsets
+HEADER = struct.Struct('<8sQQ')
+MAGIC = b'PGDPOOL1'
+# pool of bytes (bytea) values, kept as they are
+MAGIC_BYTES = b'PGDPOOLB'
+# part of the pool key, pools written by earlier versions are built again
+FORMAT = 2
+
+def cache_dir():
+    path = os.environ.get('PGDUMMY_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'pgdummy'))
+    return os.path.join(path, 'pools')
+
+def encode_value(value):
+    '''
+    bytes of a pool value and whether they're a bytes value. a LargeValue is generated as a whole
+    '''
+    if isinstance(value, LargeValue):
+        value = value.value()
+    if isinstance(value, bytes):
+        return value, True
+    return str(value).encode('utf-8'), False
+
+def write_pool(filename, values):
+    '''
+    write the values as a pool file : header, utf-8 blob of all values (or the bytes of bytea values)
+    and their offsets. written to a temp file first, so that concurrent readers never see a partial pool
+    '''
+    dirname = os.path.dirname(filename) or '.'
+    os.makedirs(dirname, exist_ok=True)
+    fd, tmpname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(HEADER.pack(MAGIC, 0, 0))
+            offsets = array('Q', [0])
+            pos = 0
+            binary = False
+            for value in values:
+                data, binary = encode_value(value)
+                fp.write(data)
+                pos += len(data)
+                offsets.append(pos)
+            fp.write(offsets.tobytes())
+            fp.seek(0)
+            fp.write(HEADER.pack(MAGIC_BYTES if binary else MAGIC, len(offsets) - 1, HEADER.size + pos))
+        os.chmod(tmpname, 0o644)
+        os.replace(tmpname, filename)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+
+class ValuePool:
+    '''
+    read-only, memory mapped pool of values. sampling is an index lookup
+    '''
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as fp:
+            self.mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, pos = HEADER.unpack_from(self.mm, 0)
+        if magic not in (MAGIC, MAGIC_BYTES):
+            raise Exception('invalid pool file : {}'.format(filename))
+        self.binary = magic == MAGIC_BYTES
+        self.offsets = memoryview(self.mm)[pos:pos + 8 * (self.count + 1)].cast('Q')
+
+    def __len__(self):
+        return self.count
+
+    def get(self, i):
+        start = HEADER.size + self.offsets[i]
+        end = HEADER.size + self.offsets[i + 1]
+        if self.binary:
+            return self.mm[start:end]
+        return self.mm[start:end].decode('utf-8')
+
+    def next(self):
+        return self.get(helpers.fake.random.randrange(self.count))
+
+_pools = {}
+
+def pool_key(provider, args, size):
+    spec = [provider, args, helpers.fake.locales, helpers.seed, size, FORMAT]
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()[:24]
+
+def get_pool(provider, fn, args, size):
+    '''
+    pool of [size] values of the [provider] called with [args], built once and
+    re-used across runs (keyed by provider, args, locale & seed)
+    '''
+    key = pool_key(provider, args, size)
+    if key in _pools:
+        return _pools[key]
+
+    filename = os.path.join(cache_dir(), '{}-{}.pool'.format(provider, key))
+    if not os.path.exists(filename):
+        eprint('building pool of {} values for {} ...'.format(size, provider))
+        # the pool is a function of its key, independent of the rng state of the run
+        random = helpers.fake.random
+        state = random.getstate()
+        random.seed(helpers.seed if helpers.seed is not None else 0)
+        try:
+            write_pool(filename, (fn() for _ in range(size)))
+        finally:
+            random.setstate(state)
+    debugprint('using pool : {}'.format(filename))
+    _pools[key] = ValuePool(filename)
+    return _pools[key]
@@ -1,7 +1,9 @@
 import string
+from datetime import datetime, timedelta
 from faker.providers import BaseProvider
+from faker.providers.date_time import Provider as DateTimeProvider
 from .helpers import eprint
-from . import helpers
+from . import blobs, encoders, helpers, patterns
 
 class SequenceGenerator:
     def __init__(self, start=1, step=1):
@@ -13,6 +15,16 @@ class SequenceGenerator:
         self.now += self.step
         return n
 
+def reference_time(value):
+    '''
+    a relative time (now, -30d) against helpers.now when it's set, so that runs match
+    '''
+    if helpers.now is None or not isinstance(value, str):
+        return value
+    if value == 'now':
+        return helpers.now
+    return helpers.now + timedelta(seconds=DateTimeProvider._parse_timedelta(value))
+
 # create new provider class
 class SimpleProvider(BaseProvider):
     def integer(self, max = 100000, min = 0) -> int:
@@ -39,7 +51,7 @@ class SimpleProvider(BaseProvider):
         '''
         generate a random time between start(-30d) and end(now) of format('%Y-%m-%d %H:%M:%S')
         '''
-        return helpers.fake.date_time_between(start, end).strftime(format)
+        return helpers.fake.date_time_between(reference_time(start), reference_time(end)).strftime(format)
 
     def string(self, max=16, min = 1, pattern=None, letters=string.ascii_uppercase):
         '''
@@ -48,7 +60,7 @@ class SimpleProvider(BaseProvider):
         - Question marks ('?') are replaced with a random character
         '''
         if pattern:
-            return self.bothify(pattern, letters=letters)
+            return patterns.compile_string(pattern, letters).generate_batch(1, self.generator.random)[0]
         else:
             l = self.generator.random.randint(min, max)
             return ''.join(self.generator.random.choices(letters, k=l))
@@ -68,9 +80,25 @@ class SimpleProvider(BaseProvider):
 
     def hex(self, pattern='^^^^^^^'):
         '''
-        generate a random hex string[A-Z0-9] on the given pattern
+        generate a random hex string[0-9a-f] on the given pattern, ^ is a hex digit
+        '''
+        return patterns.compile_hex(pattern).generate_batch(1, helpers.fake.random)[0]
+
+    def blob(self, size=16, min=None, max=None, distribution='fixed', sigma=1.0) -> 'bytes | blobs.LargeValue':
+        '''
+        generate random bytes (bytea) of [size] (eg. 16, 4KB, 2MB). distribution of the sizes :
+        fixed, uniform (between min & max) or lognormal (median size, spread sigma, within min & max).
+        values over 1MB are a LargeValue, generated in chunks when written
+        '''
+        return blobs.BlobGenerator(size, min, max, distribution, sigma).next()
+
+    def longtext(self, size=1024, min=None, max=None, distribution='fixed', sigma=1.0) -> 'str | blobs.LargeValue':
+        '''
+        generate random text [A-Za-z0-9 .] of [size] (eg. 100, 4KB, 2MB). distribution of the sizes :
+        fixed, uniform (between min & max) or lognormal (median size, spread sigma, within min & max).
+        values over 1MB are a LargeValue, generated in chunks when written
         '''
-        return helpers.fake.hexify(pattern)
+        return blobs.BlobGenerator(size, min, max, distribution, sigma, text=True).next()
 
     def foreign(self, key):
         '''
@@ -83,27 +111,144 @@ class DistinctGenerator:
         self.fn = fn
         self.maxcount = maxcount
         self.seen = set()
+        # indexable copy of seen for sampling
+        self.items = []
         
     def next(self):
 
         if len(self.seen) < self.maxcount:
             item = self.fn()
-            self.seen.add(item)
+            if item not in self.seen:
+                self.seen.add(item)
+                self.items.append(item)
         else:
-            item = helpers.fake.random_element(self.seen)
+            item = self.items[helpers.fake.random.randrange(len(self.items))]
             
         return item
 
+class AliasSampler:
+    '''
+    Walker/Vose alias table : O(1) weighted sampling of an index
+    '''
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+        small = [i for i, w in enumerate(scaled) if w < 1.0]
+        large = [i for i, w in enumerate(scaled) if w >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def sample(self):
+        random = helpers.fake.random
+        i = random.randrange(len(self.prob))
+        if random.random() < self.prob[i]:
+            return i
+        return self.alias[i]
+
+class StatsGenerator:
+    '''
+    generate values following pg_stats : most common values with their frequencies,
+    the rest spread over the (equi-depth) histogram buckets
+    '''
+    def __init__(self, mcv=None, mcf=None, histogram=None, n_distinct=0, null_fraction=0, type=None):
+        self.type = type
+        self.mcv = [self.convert(v) for v in mcv] if mcv else []
+        self.histogram = [self.convert(v) for v in histogram] if histogram else []
+        self.mcv_sampler = None
+        self.mcv_share = 0.0
+        if self.mcv:
+            self.mcv_sampler = AliasSampler(mcf)
+            # frequencies are of all the rows, nulls are decided before us
+            nonnull = 1.0 - (null_fraction or 0)
+            self.mcv_share = 1.0 if not self.histogram or nonnull <= 0 else min(1.0, sum(mcf) / nonnull)
+
+        self.n_distinct = n_distinct or 0
+        self.histfn = self.from_histogram
+        if self.n_distinct > 0:
+            self.set_rows(None)
+
+    def set_rows(self, numrows):
+        '''
+        cap the distinct values of the histogram : n_distinct, or its fraction (when negative) of [numrows]
+        '''
+        n_distinct = self.n_distinct
+        if n_distinct < 0:
+            if numrows is None:
+                return
+            n_distinct = int(round(-n_distinct * numrows))
+        self.histfn = self.from_histogram
+        remaining = n_distinct - len(self.mcv)
+        if self.histogram and remaining > 0:
+            self.histfn = DistinctGenerator(self.from_histogram, remaining).next
+
+    def convert(self, value):
+        if value is None:
+            return None
+        if self.type in encoders.INT_TYPES:
+            return int(value)
+        if self.type in encoders.FLOAT_TYPES:
+            return float(value)
+        return value
+
+    def interpolate(self, lo, hi, u):
+        if type(lo) is int:
+            return lo + int(u * (hi - lo))
+        if type(lo) is float:
+            return lo + u * (hi - lo)
+        if self.type in ['timestamp', 'timestamptz', 'date']:
+            try:
+                t1 = datetime.fromisoformat(lo)
+                t2 = datetime.fromisoformat(hi)
+            except ValueError:
+                return lo
+            t = t1 + (t2 - t1) * u
+            if self.type == 'date':
+                return t.date().isoformat()
+            return t.isoformat(sep=' ')
+        # no ordering to interpolate on, use the bounds themselves
+        return lo if u < 0.5 else hi
+
+    def from_histogram(self):
+        random = helpers.fake.random
+        if len(self.histogram) == 1:
+            return self.histogram[0]
+        i = random.randrange(len(self.histogram) - 1)
+        return self.interpolate(self.histogram[i], self.histogram[i+1], random.random())
+
+    def next(self):
+        if self.mcv_sampler and (self.mcv_share >= 1.0 or helpers.fake.random.random() < self.mcv_share):
+            return self.mcv[self.mcv_sampler.sample()]
+        if self.histogram:
+            return self.histfn()
+        return None
+
 class UniqueException(Exception):
     pass
 
 class UniqueGenerator:
-    def __init__(self, fn):
+    def __init__(self, fn, domain=None):
         self.fn = fn
         self.seen = set()
         self.maxtries = 1000
+        # no.of distinct values fn can generate, when known
+        self.domain = domain
         
     def next(self):
+        if self.domain is not None and len(self.seen) >= self.domain:
+            raise UniqueException ('all {} unique items generated'.format(self.domain))
         for n in range(self.maxtries):
             item = self.fn()
             if item not in self.seen:
@@ -112,6 +257,28 @@ class UniqueGenerator:
         raise UniqueException ('could not find unique item within {} tries'.format(self.maxtries))    
         return None 
 
+class UniquePattern(UniqueGenerator):
+    '''
+    unique values of an exact pattern without keeping them : the n-th value is the pattern value
+    at a pseudo random permutation of n. [seen] only holds values loaded by seed_pools
+    '''
+    def __init__(self, pattern):
+        super().__init__(None, pattern.domain)
+        self.pattern = pattern
+        self.permutation = None
+        self.counter = 0
+
+    def next(self):
+        # keyed on first use, after the seed of the table is set
+        if self.permutation is None:
+            self.permutation = patterns.Permutation(self.domain, helpers.fake.random)
+        while self.counter < self.domain:
+            item = self.pattern.value(self.permutation.get(self.counter))
+            self.counter += 1
+            if item not in self.seen:
+                return item
+        raise UniqueException ('all {} unique items generated'.format(self.domain))
+
 # Get the default generator mapping for pg datatypes
 def get_default_generator(column):
     g = {}
@@ -203,7 +370,8 @@ def get_default_generator(column):
         g['generator'] = 'uuid4'
 
     elif column.typename in ['bytea']:
-        g['generator'] = 'alphanumeric'
+        g['generator'] = 'blob'
+        g['size'] = 16
 
     elif column.typename in ['bit']:
         g['generator'] = 'string'
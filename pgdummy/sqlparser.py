@@ -1,7 +1,7 @@
 import pglast
 import pglast.ast
 from pglast.enums import ConstrType
-from pglast.stream import maybe_double_quote_name
+from pglast.stream import RawStream, maybe_double_quote_name
 from .helpers import debugprint, eprint
 
 class Column:
@@ -39,6 +39,14 @@ class Table:
         self.unique_constraints = []
         # {'columns' : [k1,k2] , 'reftable' : tablename, 'refcolumns' : [c1, c2]}
         self.foreignkey_constraints = []
+        # {'strategy' : 'range'|'list'|'hash', 'columns' : [k1, k2]}
+        self.partition_by = None
+        # leaf partitions [{'name', 'schema', 'bound'}], see partition_bound
+        self.partitions = []
+        # named indexes [{'name', 'sql'}]
+        self.indexes = []
+        # primary/unique/foreign key constraints [{'name', 'type', 'sql', 'reftable' (foreign)}], sql is the constraint definition
+        self.constraints = []
      
     def get_name(self):
         return '{}{}'.format(
@@ -77,6 +85,105 @@ class Table:
         return self.__str__()
         
 
+CONSTRAINT_TYPES = {
+    'CONSTR_PRIMARY' : 'primary',
+    'CONSTR_UNIQUE' : 'unique',
+    'CONSTR_FOREIGN' : 'foreign',
+}
+NAMEDATALEN = 64
+
+def object_name(name1, name2, label):
+    '''
+    default name postgres gives a constraint (makeObjectName), eg. pilot_pkey, pilot_code_fkey
+    '''
+    overhead = len(label) + 1 + (1 if name2 else 0)
+    chars1, chars2 = len(name1), len(name2 or '')
+    while chars1 + chars2 > NAMEDATALEN - 1 - overhead:
+        if chars1 > chars2:
+            chars1 -= 1
+        else:
+            chars2 -= 1
+    name = name1[:chars1]
+    if name2:
+        name += '_' + name2[:chars2]
+    return name + '_' + label
+
+def constraint_info(tablename, constraint, column=None, taken=[]):
+    '''
+    {'name', 'type', 'sql'} of a primary/unique/foreign key constraint, [column] for column constraints.
+    unnamed constraints get the default name, not in [taken]
+    '''
+    contype = CONSTRAINT_TYPES.get(constraint.contype.name)
+    if contype is None:
+        return None
+    name = constraint.conname
+    # rendered without the name, which is added back below
+    constraint.conname = None
+    sql = RawStream()(constraint)
+    constraint.conname = name
+    if contype == 'foreign':
+        columns = [column] if column else [k.val for k in constraint.fk_attrs]
+        if column:
+            sql = 'FOREIGN KEY ({}) {}'.format(safe_name(column), sql)
+    else:
+        columns = [column] if column else [k.val for k in constraint.keys]
+        if column:
+            sql = '{} ({})'.format(sql, safe_name(column))
+    if not name:
+        if contype == 'primary':
+            name = object_name(tablename, None, 'pkey')
+        else:
+            name = object_name(tablename, '_'.join(columns), 'key' if contype == 'unique' else 'fkey')
+        base = name
+        count = 0
+        while name in taken:
+            count += 1
+            name = '{}{}'.format(base, count)
+    info = {
+        'name' : name,
+        'type' : contype,
+        'sql' : 'CONSTRAINT {} {}'.format(safe_name(name), sql),
+    }
+    if contype == 'foreign':
+        info['reftable'] = constraint.pktable.relname
+    return info
+
+STRATEGIES = {'r' : 'range', 'l' : 'list', 'h' : 'hash'}
+
+def partition_strategy(strategy):
+    # enum (newer pglast) or string
+    strategy = getattr(strategy, 'value', strategy)
+    return STRATEGIES.get(str(strategy)[:1].lower(), None)
+
+def datum_value(datum):
+    '''
+    value of a partition bound datum, MINVALUE/MAXVALUE are returned as such
+    '''
+    if type(datum) == pglast.ast.ColumnRef:
+        return datum.fields[0].val.upper()
+    if type(datum) == pglast.ast.A_Const:
+        if getattr(datum, 'isnull', False):
+            return None
+        return datum.val.val
+    return None
+
+def partition_bound(spec):
+    '''
+    {'default' : True} or {'strategy', 'from', 'to' (range) / 'values' (list) / 'modulus', 'remainder' (hash)}
+    '''
+    if spec.is_default:
+        return {'default' : True}
+    bound = {'strategy' : partition_strategy(spec.strategy)}
+    if bound['strategy'] == 'range':
+        bound['from'] = [datum_value(d) for d in spec.lowerdatums]
+        bound['to'] = [datum_value(d) for d in spec.upperdatums]
+    elif bound['strategy'] == 'list':
+        bound['values'] = [datum_value(d) for d in spec.listdatums]
+    elif bound['strategy'] == 'hash':
+        bound['modulus'] = spec.modulus
+        bound['remainder'] = spec.remainder
+    return bound
+
 def parse(sql):
     '''
     Parse the given sql and return a list of tables
@@ -108,6 +215,11 @@ def parse(sql):
         return []
 
     tables = []
+    # (parent name, leaf partition)
+    partitions = []
+    # (table name, index/constraint)
+    indexes = []
+    constraints = []
     for raw_stmt in root:
         st = raw_stmt.stmt
 
@@ -117,9 +229,19 @@ def parse(sql):
             else:
                 cols = [key.name for key in st.indexParams]
                 eprint('unique idx:', cols)
+            if st.idxname:
+                indexes.append((st.relation.relname, {
+                    'name' : '{}{}'.format('' if st.relation.schemaname is None else '{}.'.format(st.relation.schemaname), safe_name(st.idxname)),
+                    'sql' : RawStream()(st),
+                }))
 
         elif type(st) == pglast.ast.AlterTableStmt:
             for cmd in [cmd for cmd in st.cmds if type(cmd) == pglast.ast.AlterTableCmd]:
+                if type(cmd.def_) != pglast.ast.Constraint:
+                    continue
+                info = constraint_info(st.relation.relname, cmd.def_)
+                if info:
+                    constraints.append((st.relation.relname, info))
                 if cmd.def_.contype.name == 'CONSTR_PRIMARY':
                     cols = [k.val for k in cmd.def_.keys]
                     eprint('primary key:', cols)
@@ -132,12 +254,30 @@ def parse(sql):
             table = Table()
             table.name = st.relation.relname
             table.schema = st.relation.schemaname
+            if st.partspec is not None:
+                table.partition_by = {
+                    'strategy' : partition_strategy(st.partspec.strategy),
+                    'columns' : [p.name for p in st.partspec.partParams],
+                }
+                debugprint('partition by: {} {}'.format(table.name, table.partition_by))
+            if st.partbound is not None and st.inhRelations:
+                # rows of a leaf are routed through its parent
+                partitions.append((st.inhRelations[0].relname, {
+                    'name' : table.name,
+                    'schema' : table.schema,
+                    'bound' : partition_bound(st.partbound),
+                }))
+                debugprint('partition of: {} {}'.format(st.inhRelations[0].relname, partitions[-1][1]))
+                continue
             if st.tableElts is None:
                 debugprint('not processing : {}.{}'.format(table.schema, table.name))
                 continue
 
             for col in st.tableElts:
                 if type(col) == pglast.ast.Constraint:
+                    info = constraint_info(table.name, col, taken=[i['name'] for i in table.constraints])
+                    if info:
+                        table.constraints.append(info)
                     # check for primary key
                     if col.contype.name == 'CONSTR_PRIMARY':
                         p_cols = [k.val for k in col.keys]
@@ -178,10 +318,18 @@ def parse(sql):
             
                     if col.constraints is not None and len(col.constraints) > 0:
                         for c in col.constraints:
+                            info = constraint_info(table.name, c, column.name, [i['name'] for i in table.constraints])
+                            if info:
+                                table.constraints.append(info)
                             if c.contype == ConstrType.CONSTR_NOTNULL:
                                 column.is_null = False
                             elif c.contype == ConstrType.CONSTR_DEFAULT:
                                 column.has_default=True
+                            elif c.contype == ConstrType.CONSTR_PRIMARY:
+                                column.is_null = False
+                                table.unique_constraints.append([column.name])
+                            elif c.contype == ConstrType.CONSTR_UNIQUE:
+                                table.unique_constraints.append([column.name])
         
                     #print(column)
                     table.columns.append(column)
@@ -193,4 +341,19 @@ def parse(sql):
         else:
             debugprint('not processing : {}'.format(st.__class__.__name__))
             continue
+
+    for parent, partition in partitions:
+        table = next((t for t in tables if t.name == parent), None)
+        if table is None:
+            eprint('parent {} of partition {} - NOT FOUND'.format(parent, partition['name']))
+            continue
+        table.partitions.append(partition)
+    for tablename, index in indexes:
+        table = next((t for t in tables if t.name == tablename), None)
+        if table is not None:
+            table.indexes.append(index)
+    for tablename, constraint in constraints:
+        table = next((t for t in tables if t.name == tablename), None)
+        if table is not None:
+            table.constraints.append(constraint)
     return tables
\ No newline at end of file
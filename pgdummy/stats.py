@@ -0,0 +1,140 @@
+import csv
+import json
+import os.path
+
+from .helpers import debugprint, eprint
+
+# columns of pg_stats used to configure a column
+STATS_KEYS = ['null_frac', 'n_distinct', 'most_common_vals', 'most_common_freqs', 'histogram_bounds']
+
+def parse_pg_array(value):
+    '''
+    parse a postgres text array literal eg. '{SFO,"San Jose",NULL}' into a list of strings
+    '''
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return value
+    value = value.strip()
+    if len(value) == 0:
+        return None
+    if not (value.startswith('{') and value.endswith('}')):
+        raise Exception('invalid array literal : {}'.format(value[:40]))
+
+    items = []
+    item = []
+    quoted = False
+    was_quoted = False
+    escaped = False
+    for ch in value[1:-1]:
+        if escaped:
+            item.append(ch)
+            escaped = False
+        elif ch == '\\':
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+            was_quoted = True
+        elif ch == ',' and not quoted:
+            items.append(_array_item(item, was_quoted))
+            item = []
+            was_quoted = False
+        else:
+            item.append(ch)
+    if item or was_quoted:
+        items.append(_array_item(item, was_quoted))
+    return items
+
+def _array_item(chars, quoted):
+    s = ''.join(chars)
+    if not quoted and s == 'NULL':
+        return None
+    return s
+
+def _float(value, default=None):
+    if value is None or value == '':
+        return default
+    return float(value)
+
+def read_rows(filename):
+    '''
+    read a pg_stats / pg_class export, either CSV with a header or JSON.
+    JSON can be a list of rows or an object with 'pg_stats' and 'pg_class' lists.
+    '''
+    with open(filename, 'r') as fp:
+        if filename.endswith('.json'):
+            data = json.load(fp)
+            if isinstance(data, dict):
+                return data.get('pg_stats', []) + data.get('pg_class', [])
+            return data
+        return list(csv.DictReader(fp))
+
+def column_stats(row):
+    '''
+    convert a pg_stats row to generator options
+    '''
+    opts = {'generator' : 'stats'}
+    mcv = parse_pg_array(row.get('most_common_vals'))
+    mcf = parse_pg_array(row.get('most_common_freqs'))
+    histogram = parse_pg_array(row.get('histogram_bounds'))
+    if mcv and mcf:
+        opts['mcv'] = mcv
+        opts['mcf'] = [float(f) for f in mcf]
+    if histogram:
+        opts['histogram'] = histogram
+
+    null_frac = _float(row.get('null_frac'), 0.0)
+    opts['null_fraction'] = null_frac
+
+    # negative n_distinct is a fraction of the rows, kept as is : scaled by the rows
+    # generated for the table (see StatsGenerator.set_rows)
+    n_distinct = _float(row.get('n_distinct'), 0.0)
+    if n_distinct > 0:
+        opts['n_distinct'] = int(round(n_distinct))
+    elif n_distinct < 0:
+        opts['n_distinct'] = n_distinct
+
+    if 'mcv' not in opts and 'histogram' not in opts:
+        return None
+    return opts
+
+def apply_stats(config, filename):
+    '''
+    configure the tables & columns of [config] from a pg_stats/pg_class export
+    '''
+    if not os.path.exists(filename):
+        eprint('stats file NOT FOUND : {}'.format(filename))
+        return False
+
+    rows = read_rows(filename)
+    for row in rows:
+        if 'reltuples' in row and 'relname' in row:
+            tuples = _float(row['reltuples'], -1)
+            table = config.get_table(row['relname'])
+            if table is None:
+                debugprint('stats: skipping table {}'.format(row['relname']))
+                continue
+            # -1 is never analyzed
+            if tuples >= 0:
+                table['numrows'] = int(tuples)
+
+    count = 0
+    for row in rows:
+        if 'attname' not in row or 'tablename' not in row:
+            continue
+        column = config.get_column(row['tablename'], row['attname'])
+        if column is None:
+            debugprint('stats: skipping column {}.{}'.format(row['tablename'], row['attname']))
+            continue
+        opts = column_stats(row)
+        if opts is None:
+            # nothing to sample from, keep the generator but use the null rate
+            column['null_fraction'] = _float(row.get('null_frac'), 0.0)
+            continue
+        for k in ['mcv', 'mcf', 'histogram', 'n_distinct']:
+            column.pop(k, None)
+        column.update(opts)
+        count += 1
+
+    debugprint('stats: configured {} columns from {}'.format(count, filename))
+    return True
@@ -0,0 +1,73 @@
+import time
+
+from .helpers import eprint
+
+class TokenBucket:
+    '''
+    paces [rate] tokens per second, with bursts up to [burst] tokens.
+    a caller going over the budget sleeps off the debt, so the long run rate stays exact
+    '''
+    def __init__(self, rate, burst=None, clock=time.perf_counter, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst else max(1.0, self.rate / 10)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.last = clock()
+
+    def acquire(self, count=1):
+        '''
+        take [count] tokens, returns the seconds waited
+        '''
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        self.tokens -= count
+        if self.tokens >= 0:
+            return 0.0
+        wait = -self.tokens / self.rate
+        self.sleep(wait)
+        return wait
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+class RateReporter:
+    '''
+    reports the achieved vs target rate and the batch latency percentiles every [interval] seconds
+    '''
+    def __init__(self, rate, interval=5.0, clock=time.perf_counter):
+        self.rate = rate
+        self.interval = interval
+        self.clock = clock
+        self.start = clock()
+        self.last = self.start
+        self.total = 0
+        self.rows = 0
+        self.latencies = []
+
+    def record(self, rows, latency):
+        self.rows += rows
+        self.total += rows
+        self.latencies.append(latency)
+        now = self.clock()
+        if now - self.last >= self.interval:
+            self.report(now)
+
+    def report(self, now=None):
+        now = now or self.clock()
+        elapsed = now - self.last
+        if elapsed <= 0:
+            return
+        target = ' target:{:.0f}/s'.format(self.rate) if self.rate else ''
+        eprint('{:8.1f}s rows:{} rate:{:.0f}/s{} latency p50:{:.1f}ms p95:{:.1f}ms p99:{:.1f}ms'.format(
+            now - self.start, self.total, self.rows / elapsed, target,
+            percentile(self.latencies, 0.50) * 1000,
+            percentile(self.latencies, 0.95) * 1000,
+            percentile(self.latencies, 0.99) * 1000))
+        self.last = now
+        self.rows = 0
+        self.latencies = []
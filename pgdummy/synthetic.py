@@ -0,0 +1,68 @@
+import random
+
+# pg types of the extra columns, picked in turn
+TYPE_MIX = ['int4', 'int8', 'text', 'varchar(20)', 'numeric(10,2)', 'timestamp', 'bool', 'uuid', 'date']
+# types with a domain large enough for unique constraints
+UNIQUE_TYPES = ['int8', 'text', 'varchar(20)', 'uuid']
+
+def table_name(n):
+    return 't{}'.format(n)
+
+def fk_parents(tables, fk_depth, fanout):
+    '''
+    parent index (or None) of each table. tables are attached breadth first,
+    [fanout] children per parent, chains at most [fk_depth] long
+    '''
+    parents = []
+    depth = []
+    children = []
+    candidate = 0
+    for n in range(tables):
+        parent = None
+        while fk_depth > 0 and fanout > 0 and candidate < n:
+            if depth[candidate] < fk_depth and children[candidate] < fanout:
+                parent = candidate
+                children[candidate] += 1
+                break
+            candidate += 1
+        parents.append(parent)
+        depth.append(0 if parent is None else depth[parent] + 1)
+        children.append(0)
+    return parents
+
+def make_schema(tables=10, columns=8, types=None, fk_depth=2, fanout=2, unique=1, seed=0):
+    '''
+    synthetic schema of [tables] tables with an id primary key, a foreign key to the parent
+    table, [columns] columns from the [types] mix and [unique] two-column unique constraints.
+    returns (sql, config) where config is in the yaml config format
+    '''
+    rng = random.Random(seed)
+    types = types or TYPE_MIX
+    parents = fk_parents(tables, fk_depth, fanout)
+    sql = []
+    config = {'tables': {}}
+    for n in range(tables):
+        name = table_name(n)
+        tconfig = {'id': {'generator': 'sequence'}}
+        lines = ['    id int8 NOT NULL']
+        if parents[n] is not None:
+            parent = table_name(parents[n])
+            lines.append('    {}_id int8 NOT NULL'.format(parent))
+            tconfig['{}_id'.format(parent)] = {'generator': 'foreign', 'key': '{}.id'.format(parent)}
+
+        colnames = []
+        coltypes = []
+        for c in range(columns):
+            typename = types[rng.randrange(len(types))]
+            colnames.append('c{}'.format(c))
+            coltypes.append(typename)
+            lines.append('    c{} {}'.format(c, typename))
+
+        lines.append('    PRIMARY KEY (id)')
+        candidates = [c for c, t in zip(colnames, coltypes) if t in UNIQUE_TYPES]
+        for u in range(min(unique, len(candidates) // 2)):
+            lines.append('    UNIQUE ({}, {})'.format(candidates[2 * u], candidates[2 * u + 1]))
+        sql.append('CREATE TABLE public.{} (\n{}\n);\n'.format(name, ',\n'.join(lines)))
+        config['tables'][name] = tconfig
+
+    return '\n'.join(sql), config
@@ -0,0 +1,227 @@
+import math
+
+from . import helpers
+from .helpers import debugprint, eprint
+from .providers import UniqueException
+from .sqlparser import safe_name
+from .writers import literal
+
+DEFAULT_MIX = 'update=70,delete=30'
+# serial pseudo types are no types to cast to, their storage types are
+SERIAL_TYPES = {
+    'smallserial' : 'int2', 'serial2' : 'int2',
+    'serial' : 'int4', 'serial4' : 'int4',
+    'bigserial' : 'int8', 'serial8' : 'int8',
+}
+
+def parse_mix(mix):
+    '''
+    'update=70,delete=20,insert=10' -> [(kind, weight)]
+    '''
+    weights = []
+    for item in mix.split(','):
+        kind, _, weight = item.partition('=')
+        kind = kind.strip().lower()
+        if kind not in ['update', 'delete', 'insert']:
+            raise Exception('invalid statement kind in mix : {}'.format(kind))
+        weights.append((kind, float(weight or 1)))
+    return weights
+
+class KeyChooser:
+    '''
+    picks a position in a key pool of size n per the skew :
+    uniform, zipf:S (power law over the positions) or hotspot:F,P (P of the picks go to the first F of the keys)
+    '''
+    def __init__(self, skew='uniform'):
+        name, _, args = skew.partition(':')
+        self.kind = name.strip().lower()
+        params = [float(a) for a in args.split(',') if a.strip()]
+        if self.kind == 'zipf':
+            self.s = params[0] if params else 1.0
+        elif self.kind == 'hotspot':
+            self.fraction = params[0] if params else 0.2
+            self.share = params[1] if len(params) > 1 else 0.8
+        elif self.kind != 'uniform':
+            raise Exception('invalid skew : {}'.format(skew))
+
+    def pick(self, n):
+        random = helpers.fake.random
+        if self.kind == 'zipf':
+            # inverse cdf of the continuous power law over [1, n+1)
+            u = random.random()
+            if abs(self.s - 1.0) < 1e-9:
+                x = math.pow(n + 1, u)
+            else:
+                e = 1.0 - self.s
+                x = math.pow((math.pow(n + 1, e) - 1.0) * u + 1.0, 1.0 / e)
+            return min(n - 1, int(x) - 1)
+        if self.kind == 'hotspot':
+            hot = max(1, int(n * self.fraction))
+            if random.random() < self.share or hot >= n:
+                return random.randrange(hot)
+            return hot + random.randrange(n - hot)
+        return random.randrange(n)
+
+class TableKeys:
+    '''
+    live keys of a table, taken from the unique/primary key tracked while generating
+    '''
+    def __init__(self, dummy, table):
+        self.dummy = dummy
+        self.table = table
+        self.name = table['name']
+        self.key = table['unique'][0]
+        cache = dummy.datagen.unique_cache.cache
+        self.tracked = cache.setdefault((self.name, tuple(self.key)), set())
+        # sorted, the order of a set changes with the hash seed of the process
+        try:
+            self.keys = sorted(self.tracked)
+        except TypeError:
+            self.keys = sorted(self.tracked, key=repr)
+        unique_cols = set([col for unique in table['unique'] for col in unique])
+        # referenced columns, unique & sequence columns are left alone
+        self.columns = [c for c in table['columns']
+                        if c['name'] not in unique_cols
+                        and not c.get('is_foreignkey', False)
+                        and not c.get('unique', False)
+                        and c['generator'] != 'sequence']
+        # rows referenced by other tables can not be deleted
+        self.deletable = not any([c.get('is_foreignkey', False) for c in table['columns']])
+
+    def remove(self, pos):
+        key = self.keys[pos]
+        self.keys[pos] = self.keys[-1]
+        self.keys.pop()
+        self.tracked.discard(key)
+        return key
+
+class Workload:
+    '''
+    UPDATE/DELETE (and INSERT) statements against the rows generated in this run
+    '''
+    def __init__(self, dummy, mix=DEFAULT_MIX, skew='uniform', batch=1, tablefilter=[]):
+        self.dummy = dummy
+        self.config = dummy.config
+        self.mix = parse_mix(mix)
+        self.total = sum([w for _, w in self.mix])
+        self.chooser = KeyChooser(skew)
+        self.batch = max(1, batch)
+        self.tables = []
+        for table in self.config.data['tables']:
+            if len(tablefilter) > 0 and table['name'] not in tablefilter:
+                continue
+            if not table['unique']:
+                debugprint('workload: skipping {}, no unique/primary key'.format(table['name']))
+                continue
+            self.tables.append(TableKeys(dummy, table))
+        if not self.tables:
+            raise Exception('no tables with a unique/primary key for the workload')
+
+    def value(self, tablename, column):
+        fraction = column.get('null_fraction', 0)
+        if fraction and helpers.fake.random.random() < fraction:
+            return None
+        return self.config.get_generator(tablename, column['name'])()
+
+    def cast(self, column):
+        typename = column.get('type')
+        if not typename:
+            return ''
+        return '::{}'.format(SERIAL_TYPES.get(typename, typename))
+
+    def where(self, keys, names):
+        if len(names) == 1:
+            values = [literal(k[0]) for k in keys]
+            if len(values) == 1:
+                return '{} = {}'.format(names[0], values[0])
+            return '{} IN ({})'.format(names[0], ','.join(values))
+        tuples = ['({})'.format(','.join([literal(v) for v in k])) for k in keys]
+        if len(tuples) == 1:
+            return ' AND '.join(['{} = {}'.format(n, v) for n, v in zip(names, [literal(v) for v in keys[0]])])
+        return '({}) IN ({})'.format(','.join(names), ','.join(tuples))
+
+    def pick(self, tkeys, count, remove=False):
+        keys = []
+        for n in range(count):
+            if not tkeys.keys:
+                break
+            pos = self.chooser.pick(len(tkeys.keys))
+            keys.append(tkeys.remove(pos) if remove else tkeys.keys[pos])
+        return keys
+
+    def update(self, tkeys):
+        if not tkeys.columns:
+            return None
+        keys = self.pick(tkeys, self.batch)
+        if not keys:
+            return None
+        column = tkeys.columns[helpers.fake.random.randrange(len(tkeys.columns))]
+        tablename = self.dummy.get_table(tkeys.name).get_name()
+        name = safe_name(column['name'])
+        keynames = [safe_name(k) for k in tkeys.key]
+        if len(keys) == 1:
+            return 'UPDATE {} SET {} = {} WHERE {};'.format(tablename, name,
+                literal(self.value(tkeys.name, column)), self.where(keys, keynames))
+
+        keycols = [self.config.get_column(tkeys.name, k) for k in tkeys.key]
+        values = ['({},{})'.format(','.join([literal(v) for v in k]), literal(self.value(tkeys.name, column))) for k in keys]
+        return 'UPDATE {0} AS t SET {1} = v.{1}{2} FROM (VALUES {3}) AS v({4},{1}) WHERE {5};'.format(
+            tablename, name, self.cast(column), ','.join(values), ','.join(keynames),
+            ' AND '.join(['t.{0} = v.{0}{1}'.format(k, self.cast(c)) for k, c in zip(keynames, keycols)]))
+
+    def delete(self, tkeys):
+        if not tkeys.deletable:
+            return None
+        keys = self.pick(tkeys, self.batch, remove=True)
+        if not keys:
+            return None
+        tablename = self.dummy.get_table(tkeys.name).get_name()
+        return 'DELETE FROM {} WHERE {};'.format(tablename, self.where(keys, [safe_name(k) for k in tkeys.key]))
+
+    def insert(self, tkeys):
+        table = self.dummy.get_table(tkeys.name)
+        colnames = [c.name for c in table.columns]
+        nulls = self.dummy.datagen.null_masks(colnames, tkeys.name, self.batch)
+        rows = []
+        for n in range(self.batch):
+            try:
+                rows.append(self.dummy.datagen.row(colnames, tkeys.name, nulls[n]))
+            except UniqueException as e:
+                eprint(e)
+                break
+        if not rows:
+            return None
+        # the new keys can be updated/deleted too
+        index = [colnames.index(k) for k in tkeys.key]
+        for row in rows:
+            key = tuple([row[i] for i in index])
+            if None not in key:
+                tkeys.keys.append(key)
+        return 'INSERT INTO {} ({}) VALUES {};'.format(table.get_name(), ','.join([safe_name(c) for c in colnames]),
+            ','.join(['({})'.format(','.join([literal(v) for v in row])) for row in rows]))
+
+    def statement(self):
+        r = helpers.fake.random.random() * self.total
+        kind = self.mix[-1][0]
+        for k, weight in self.mix:
+            if r < weight:
+                kind = k
+                break
+            r -= weight
+        tkeys = self.tables[helpers.fake.random.randrange(len(self.tables))]
+        return getattr(self, kind)(tkeys)
+
+    def iter_statements(self, count):
+        '''
+        yields [count] statements (batches of [batch] keys each), fewer when the keys run out
+        '''
+        misses = 0
+        emitted = 0
+        while emitted < count and misses < 1000:
+            sql = self.statement()
+            if sql is None:
+                misses += 1
+                continue
+            misses = 0
+            emitted += 1
+            yield sql
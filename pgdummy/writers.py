@@ -1,25 +1,63 @@
+import io
+import os
+import sys
+
+from .blobs import LargeValue
+from .encoders import encode_chunks, encode_row, encode_rows, get_encoders, streams
+from .partitions import get_router
 from .sqlparser import safe_name
 
+def literal(v):
+    '''
+    sql literal of a value
+    '''
+    if v is None:
+        return 'NULL'
+    elif type(v) == str:
+        return "'{}'".format(v.replace("'", "''"))
+    elif type(v) == bool:
+        return 'true' if v else 'false'
+    elif type(v) == bytes:
+        return "'\\x{}'".format(v.hex())
+    elif isinstance(v, LargeValue):
+        return "'{}'".format(v)
+    return str(v)
+
 class Writer:
-    def __init__(self):
-        pass
+    def __init__(self, out=None):
+        self.out = out
+
+    @property
+    def stream(self):
+        return self.out if self.out is not None else sys.stdout
 
-    def table(self, tablename, column_infos):
+    def table(self, tablename, columns, column_infos=None):
         pass
 
     def row(self, columns):
         pass
 
+    def rows(self, rows):
+        for row in rows:
+            self.row(row)
+
     def table_end(self, tablename):
         pass
 
+    def statements(self, statements):
+        pass
+
+    def finish(self):
+        pass
+
 
 class InsertWriter(Writer):
-    def __init__(self):
+    def __init__(self, out=None):
+        super().__init__(out)
         self.tablename = None
         self.sqlt = []
-    
-    def table(self, tablename, _columns):
+
+    def table(self, tablename, _columns, column_infos=None):
         # check for quoting
         columns = [safe_name(c) for c in _columns]
 
@@ -30,28 +68,31 @@ class InsertWriter(Writer):
 
         self.sqlt = ' '.join(self.sqlt)
         self.tablename = tablename
-        print('--')
-        print('-- data for [{}]'.format(tablename))
-        print('--')
+        print('--', file=self.stream)
+        print('-- data for [{}]'.format(tablename), file=self.stream)
+        print('--', file=self.stream)
 
     def row(self, columns):
-        values = []
-        for v in columns:
-            if type(v) == str:
-                values.append("'{}'".format(v))
-            else:
-                values.append(str(v))
-        print(self.sqlt.format(','.join(values)))
+        print(self.sqlt.format(','.join([literal(v) for v in columns])), file=self.stream)
+
+    def statements(self, statements):
+        self.stream.write('\n'.join(statements))
+        self.stream.write('\n')
 
     def table_end(self, tablename):
-        print()
-        print()
+        print(file=self.stream)
+        print(file=self.stream)
 
 
 class DumpWriter(Writer):
-    def __init__(self):
+    # options of the COPY statements
+    copy_options = ''
+
+    def __init__(self, out=None):
+        super().__init__(out)
         self.tablename = None
         self.once = False
+        self.encoders = []
 
     def printHeader(self):
         if self.once : return
@@ -68,29 +109,291 @@ SET client_min_messages = warning;
 SET row_security = off;
 SET search_path To public;
 
-        """)
-    
-    def table(self, tablename, _columns):
+        """, file=self.stream)
+
+    def table(self, tablename, _columns, column_infos=None):
         self.printHeader()
         # check for quoting
         columns = [safe_name(c) for c in _columns]
+        # pick the encoders once per table
+        self.encoders = get_encoders(column_infos or [None] * len(columns), stream=True)
+        self.streaming = streams(self.encoders)
 
         self.sqlt = []
         self.sqlt.append('COPY {} ('.format(tablename))
         self.sqlt.append(','.join(columns))
-        self.sqlt.append(') FROM stdin;')
+        self.sqlt.append(') FROM stdin{};'.format(self.copy_options))
 
         self.sqlt = ' '.join(self.sqlt)
         self.tablename = tablename
-        print('-- ')
-        print('-- data for [{}]'.format(tablename))
-        print('-- ')
-        print()
-        print(self.sqlt)
+        print('-- ', file=self.stream)
+        print('-- data for [{}]'.format(tablename), file=self.stream)
+        print('-- ', file=self.stream)
+        print(file=self.stream)
+        print(self.sqlt, file=self.stream)
+
+    def row(self, columns):
+        if self.streaming:
+            return self.write_fields(columns)
+        self.stream.write(encode_row(self.encoders, columns))
+        self.stream.write('\n')
+
+    def write_fields(self, columns):
+        '''
+        write a row field by field, large values in chunks
+        '''
+        out = self.stream
+        for n, (e, v) in enumerate(zip(self.encoders, columns)):
+            if n > 0:
+                out.write('\t')
+            v = e(v)
+            if isinstance(v, LargeValue):
+                for chunk in encode_chunks(v):
+                    out.write(chunk)
+            else:
+                out.write(v)
+        out.write('\n')
+
+    def rows(self, rows):
+        if not rows:
+            return
+        if self.streaming:
+            for row in rows:
+                self.write_fields(row)
+            return
+        self.stream.write('\n'.join(encode_rows(self.encoders, rows)))
+        self.stream.write('\n')
+
+    def table_end(self, tablename):
+        print('\\.', file=self.stream)
+        print(file=self.stream)
+
+    def statements(self, statements):
+        self.printHeader()
+        self.stream.write('\n'.join(statements))
+        self.stream.write('\n')
+
+
+class LoadWriter(DumpWriter):
+    '''
+    load optimized dump : the indexes & constraints of the loaded tables ([names] of the parsed
+    [tables], default all) are dropped upfront and recreated by finish, each table is truncated &
+    copied with FREEZE in its own transaction, [unlogged] during the load. finish also runs ANALYZE
+    and moves the sequences of the [config] sequence columns past the loaded values
+    '''
+    def __init__(self, tables, config=None, names=None, unlogged=False, out=None):
+        super().__init__(out)
+        self.tables = tables
+        self.config = config
+        self.names = set(names) if names else set([t.name for t in tables])
+        self.unlogged = unlogged
+        self.loaded = []
+        self.finished = False
+
+    def loading(self, table):
+        return table.name in self.names
+
+    def foreign_keys(self):
+        '''
+        (table, constraint) of the foreign keys from or to the loaded tables
+        '''
+        return [(t, c) for t in self.tables for c in t.constraints
+                if c['type'] == 'foreign' and (self.loading(t) or c['reftable'] in self.names)]
+
+    def keys(self):
+        return [(t, c) for t in self.tables if self.loading(t) for c in t.constraints if c['type'] != 'foreign']
+
+    def indexes(self):
+        return [(t, i) for t in self.tables if self.loading(t) for i in t.indexes]
+
+    def printHeader(self):
+        if self.once : return
+        super().printHeader()
+        lines = ['-- indexes & constraints are recreated after the load']
+        # foreign keys depend on the primary/unique keys
+        for table, constraint in self.foreign_keys() + self.keys():
+            lines.append('ALTER TABLE {} DROP CONSTRAINT IF EXISTS {};'.format(table.get_name(), safe_name(constraint['name'])))
+        for table, index in self.indexes():
+            lines.append('DROP INDEX IF EXISTS {};'.format(index['name']))
+        print('\n'.join(lines), file=self.stream)
+        print(file=self.stream)
+
+    def get_table(self, tablename):
+        return next((t for t in self.tables if t.get_name() == tablename or t.name == tablename), None)
+
+    def table(self, tablename, _columns, column_infos=None):
+        self.printHeader()
+        table = self.get_table(tablename)
+        # no FREEZE/UNLOGGED for partitioned tables
+        partitioned = table is not None and table.partition_by is not None
+        if self.unlogged and not partitioned:
+            print('ALTER TABLE {} SET UNLOGGED;'.format(tablename), file=self.stream)
+        print('BEGIN;', file=self.stream)
+        print('TRUNCATE {};'.format(tablename), file=self.stream)
+        self.copy_options = '' if partitioned else ' WITH (FREEZE)'
+        self.loaded.append((tablename, table, partitioned))
+        super().table(tablename, _columns, column_infos)
+
+    def table_end(self, tablename):
+        super().table_end(tablename)
+        print('COMMIT;', file=self.stream)
+        print(file=self.stream)
+
+    def finish(self):
+        # once, also when a workload follows the data
+        if self.finished:
+            return
+        self.finished = True
+        self.printHeader()
+        lines = []
+        if self.unlogged:
+            lines.extend(['ALTER TABLE {} SET LOGGED;'.format(name) for name, _, partitioned in self.loaded if not partitioned])
+        for table, constraint in self.keys():
+            lines.append('ALTER TABLE {} ADD {};'.format(table.get_name(), constraint['sql']))
+        for table, index in self.indexes():
+            lines.append('{};'.format(index['sql']))
+        for table, constraint in self.foreign_keys():
+            lines.append('ALTER TABLE {} ADD {};'.format(table.get_name(), constraint['sql']))
+        for name, table, _ in self.loaded:
+            lines.append('ANALYZE {};'.format(name))
+        for name, table, _ in self.loaded:
+            if table is None or self.config is None:
+                continue
+            for column in table.columns:
+                colcfg = self.config.get_column(table.name, column.name)
+                if colcfg is None or colcfg.get('generator') != 'sequence':
+                    continue
+                # serial/identity/owned sequences only
+                sequence = 'pg_get_serial_sequence({}, {})'.format(literal(name), literal(column.name))
+                lines.append('SELECT setval({0}, max({1})) FROM {2} HAVING max({1}) IS NOT NULL AND {0} IS NOT NULL;'.format(
+                    sequence, safe_name(column.name), name))
+        print('\n'.join(lines), file=self.stream)
+
+
+class DirectoryWriter(Writer):
+    '''
+    a COPY file per table in [dirname] : <table>[suffix].sql. with [config], the rows of
+    partitioned tables go to a file per leaf partition instead of the parent
+    '''
+    def __init__(self, dirname, config=None, suffix=''):
+        super().__init__()
+        os.makedirs(dirname, exist_ok=True)
+        self.dirname = dirname
+        self.config = config
+        self.suffix = suffix
+        self.tablename = None
+        self.router = None
+        self.writers = {}
+        # the statements of a workload, one file per run
+        self.statement_writer = None
+
+    def filename(self, name):
+        return os.path.join(self.dirname, '{}{}.sql'.format(name, self.suffix))
+
+    def writer(self, name):
+        writer = self.writers.get(name)
+        if writer is None:
+            writer = DumpWriter(open(self.filename(name), 'w'))
+            writer.table(name, self.columns, self.column_infos)
+            self.writers[name] = writer
+        return writer
+
+    def table(self, tablename, columns, column_infos=None):
+        self.tablename = tablename
+        self.columns = columns
+        self.column_infos = column_infos
+        self.router = get_router(self.config, tablename, columns)
+        self.writers = {}
+        if self.router is None:
+            self.writer(tablename)
 
     def row(self, columns):
-        print('\t'.join(map(str , columns)))
+        self.rows([columns])
+
+    def rows(self, rows):
+        if self.router is None:
+            self.writer(self.tablename).rows(rows)
+            return
+        for leaf, group in self.router.split(rows).items():
+            self.writer(leaf or self.tablename).rows(group)
 
     def table_end(self, tablename):
-        print('\.')
-        print()
+        for writer in self.writers.values():
+            writer.table_end(tablename)
+            writer.out.close()
+        self.writers = {}
+
+    def statements(self, statements):
+        if self.statement_writer is None:
+            self.statement_writer = DumpWriter(open(self.filename('statements'), 'w'))
+        self.statement_writer.statements(statements)
+
+    def finish(self):
+        if self.statement_writer is not None:
+            self.statement_writer.out.close()
+            self.statement_writer = None
+
+
+class ConnectionWriter(Writer):
+    '''
+    COPY the rows straight into a database, needs psycopg (3) or psycopg2.
+    with [config], the rows of partitioned tables are copied into the leaf partitions
+    '''
+    def __init__(self, dsn, config=None):
+        super().__init__()
+        self.config = config
+        try:
+            import psycopg
+            self.conn = psycopg.connect(dsn)
+            self.driver = 3
+        except ImportError:
+            try:
+                import psycopg2
+            except ImportError:
+                raise Exception('writing to a database needs psycopg or psycopg2 installed')
+            self.conn = psycopg2.connect(dsn)
+            self.driver = 2
+        self.tablename = None
+        self.columns = []
+        self.router = None
+        self.encoders = []
+
+    def table(self, tablename, _columns, column_infos=None):
+        self.columns = [safe_name(c) for c in _columns]
+        self.encoders = get_encoders(column_infos or [None] * len(self.columns))
+        self.router = get_router(self.config, tablename, _columns)
+        self.tablename = tablename
+
+    def row(self, columns):
+        self.rows([columns])
+
+    def copy(self, name, lines):
+        '''
+        COPY a batch of encoded lines into the table/leaf [name]. the batches of a table are committed at its end
+        '''
+        sql = 'COPY {} ({}) FROM STDIN'.format(name, ','.join(self.columns))
+        data = '\n'.join(lines) + '\n'
+        with self.conn.cursor() as cur:
+            if self.driver == 3:
+                with cur.copy(sql) as copy:
+                    copy.write(data)
+            else:
+                cur.copy_expert(sql, io.StringIO(data))
+
+    def rows(self, rows):
+        if not rows:
+            return
+        if self.router is None:
+            self.copy(self.tablename, encode_rows(self.encoders, rows))
+            return
+        for leaf, group in self.router.split(rows).items():
+            self.copy(leaf or self.tablename, encode_rows(self.encoders, group))
+
+    def table_end(self, tablename):
+        self.conn.commit()
+
+    def statements(self, statements):
+        with self.conn.cursor() as cur:
+            for statement in statements:
+                cur.execute(statement)
+        self.conn.commit()
@@ -0,0 +1,37 @@
+import pytest
+
+from pgdummy import helpers
+from pgdummy.fakedata import DummyDB
+from pgdummy.sqlparser import parse
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    '''
+    the foreign key pools & reference time are module globals, one set per test
+    '''
+    monkeypatch.setattr(helpers, 'cache', helpers.Cache())
+    monkeypatch.setattr(helpers, 'now', None)
+    monkeypatch.setattr(helpers, 'seed', None)
+
+def make_dummy(sql, data=None, seed=1):
+    '''
+    a DummyDB of the schema [sql] and config [data], like a run with --seed
+    '''
+    dummy = DummyDB()
+    dummy.seed = seed
+    helpers.seed = seed
+    dummy.tables = parse(sql)
+    for table in dummy.tables:
+        dummy.config.add_table(table)
+    if data:
+        dummy.config.update(data)
+    return dummy
+
+def table_rows(dummy, numrows, tablefilter=[]):
+    '''
+    the generated rows of every table : name -> rows
+    '''
+    rows = {}
+    for table, batch in dummy.iter_data(numrows, tablefilter=tablefilter):
+        rows.setdefault(table.name, []).extend([tuple(row) for row in batch])
+    return rows
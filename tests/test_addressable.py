@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import pytest
+
+from pgdummy import helpers
+
+from conftest import make_dummy, table_rows
+
+SCHEMA = '''
+CREATE TABLE parent (id integer PRIMARY KEY, tag text, at timestamp);
+CREATE TABLE child (id integer PRIMARY KEY, pid integer, kind text, note text);
+'''
+CONFIG = {'tables' : {
+    'parent' : {
+        'id' : {'generator' : 'sequence'},
+        'tag' : {'generator' : 'string', 'pattern' : 'T-####'},
+        'at' : {'generator' : 'timestamp', 'start' : '-30d', 'end' : 'now'},
+    },
+    'child' : {
+        'id' : {'generator' : 'sequence'},
+        'pid' : {'generator' : 'foreign', 'key' : 'parent.id'},
+        'kind' : {'generator' : 'oneof', 'items' : ['a', 'b', 'c'], 'distinct' : 2},
+        'note' : {'generator' : 'alphanumeric', 'null_fraction' : 0.3},
+    },
+}}
+
+def addressable_rows(numrows, part=None, row_range=None):
+    dummy = make_dummy(SCHEMA, CONFIG, seed=42)
+    dummy.part = part
+    dummy.row_range = row_range
+    dummy.enable_addressable(numrows)
+    return table_rows(dummy, numrows)
+
+@pytest.fixture
+def pinned_now(monkeypatch):
+    monkeypatch.setattr(helpers, 'now', datetime(2024, 6, 1))
+
+def test_parts_equal_the_full_run(pinned_now):
+    full = addressable_rows(100)
+    parts = [addressable_rows(100, part=(part, 3)) for part in range(3)]
+    for name in ['parent', 'child']:
+        assert len(full[name]) == 100
+        assert [row for rows in parts for row in rows[name]] == full[name]
+
+def test_row_range_equals_the_full_run(pinned_now):
+    full = addressable_rows(100)
+    rows = addressable_rows(100, row_range=(10, 20))
+    assert rows['child'] == full['child'][10:20]
+
+def test_foreign_keys_point_at_generated_rows(pinned_now):
+    full = addressable_rows(100)
+    ids = set([row[0] for row in full['parent']])
+    assert all([row[1] in ids for row in full['child']])
+
+def test_now_is_pinned_without_an_option():
+    first = addressable_rows(20)
+    assert helpers.now is not None
+    assert addressable_rows(20) == first
+
+@pytest.mark.parametrize('part', ['3/3', '-1/3', '1/0', 'x', '1/2/3'])
+def test_invalid_part(part):
+    with pytest.raises(Exception, match='invalid part'):
+        helpers.parse_part(part)
+
+def test_parse_part_and_row_range():
+    assert helpers.parse_part('2/8') == (2, 8)
+    assert helpers.parse_row_range('5:10') == (5, 10)
+    with pytest.raises(Exception, match='invalid row range'):
+        helpers.parse_row_range('10:5')
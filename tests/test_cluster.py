@@ -0,0 +1,39 @@
+import random
+
+from pgdummy import cluster
+
+def make_rows(count):
+    rng = random.Random(3)
+    return [(n, rng.choice([None] + list(range(50)))) for n in range(count)]
+
+def clustered(rows, correlation, run_rows=100, fanin=None):
+    clusterer = cluster.Clusterer(['id', 'value'], ['value'], correlation, run_rows)
+    if fanin:
+        clusterer.sorter.fanin = fanin
+    batches = [rows[n:n + 64] for n in range(0, len(rows), 64)]
+    return [row for batch in clusterer.batches(batches, 37) for row in batch]
+
+def test_merge_keeps_every_row_in_order():
+    rows = make_rows(1000)
+    # 10 spilled runs, merged 3 at a time
+    out = clustered(rows, 1.0, run_rows=100, fanin=3)
+    assert sorted(out) == sorted(rows)
+    keys = [cluster.sort_key([row[1]]) for row in out]
+    assert keys == sorted(keys)
+    assert out[-1][1] is None
+
+def test_descending():
+    rows = make_rows(1000)
+    out = clustered(rows, -1.0)
+    assert sorted(out) == sorted(rows)
+    keys = [cluster.sort_key([row[1]]) for row in out]
+    assert keys == sorted(keys, reverse=True)
+
+def test_in_memory_run():
+    rows = make_rows(500)
+    out = clustered(rows, 1.0, run_rows=100000)
+    assert [cluster.sort_key([row[1]]) for row in out] == sorted([cluster.sort_key([row[1]]) for row in rows])
+
+def test_partial_correlation_keeps_every_row():
+    rows = make_rows(1000)
+    assert sorted(clustered(rows, 0.5)) == sorted(rows)
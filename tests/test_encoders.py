@@ -0,0 +1,37 @@
+from pgdummy import encoders
+from pgdummy.blobs import LargeValue
+
+def test_text_escapes():
+    assert encoders.encode_text('a\tb\nc\rd\\e') == 'a\\tb\\nc\\rd\\\\e'
+    assert encoders.encode_text('plain') == 'plain'
+
+def test_null_and_null_like_text():
+    assert encoders.encode_text(None) == '\\N'
+    # a literal \N string is escaped, not read back as null
+    assert encoders.encode_text('\\N') == '\\\\N'
+
+def test_bytea_hex_format():
+    assert encoders.encode_bytea(b'\x00\xff\n') == '\\\\x00ff0a'
+    assert encoders.encode_bytea(None) == '\\N'
+
+def test_typed_encoders():
+    assert encoders.encode_int(42) == '42'
+    assert encoders.encode_bool(True) == 't'
+    assert encoders.encode_bool(False) == 'f'
+    assert encoders.decimal_encoder(2)(1.005) == '%.2f' % 1.005
+
+def test_encoder_of_a_column():
+    assert encoders.get_encoder({'type' : 'bytea', 'generator' : 'blob'}) is encoders.encode_bytea
+    assert encoders.get_encoder({'type' : 'integer', 'generator' : 'integer'}) is encoders.encode_int
+
+def test_encode_rows():
+    rows = [(1, 'a\tb', None), (2, 'c', True)]
+    encs = [encoders.encode_int, encoders.encode_text, encoders.encode_bool]
+    assert encoders.encode_rows(encs, rows) == ['1\ta\\tb\t\\N', '2\tc\tt']
+    assert encoders.encode_rows(encs, rows) == [encoders.encode_row(encs, row) for row in rows]
+
+def test_large_value_chunks_match_the_value():
+    blob = LargeValue(200000, 7)
+    assert ''.join(encoders.encode_chunks(blob)) == encoders.encode_bytea(blob.value())
+    text = LargeValue(200000, 7, text=True)
+    assert ''.join(encoders.encode_chunks(text)) == encoders.encode_text(text.value())
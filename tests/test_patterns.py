@@ -0,0 +1,24 @@
+import random
+
+import pytest
+
+from pgdummy import patterns
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 16, 100, 1000, 4097])
+def test_permutation_is_a_bijection(size):
+    perm = patterns.Permutation(size, random.Random(size))
+    assert sorted([perm.get(i) for i in range(size)]) == list(range(size))
+
+def test_permutation_depends_on_the_rng():
+    first = patterns.Permutation(1000, random.Random(1))
+    second = patterns.Permutation(1000, random.Random(2))
+    assert [first.get(i) for i in range(1000)] != [second.get(i) for i in range(1000)]
+
+def test_pattern_values_cover_the_domain():
+    pattern = patterns.compile_string('C#?', 'AB')
+    assert pattern.exact and pattern.domain == 20
+    assert len(set([pattern.value(i) for i in range(pattern.domain)])) == 20
+
+def test_letters_from_a_list():
+    pattern = patterns.compile_string('??', ['x', 'y'])
+    assert set(pattern.generate_batch(100, random.Random(1))) <= {'xx', 'xy', 'yx', 'yy'}
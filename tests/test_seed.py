@@ -0,0 +1,75 @@
+import io
+
+from pgdummy.writers import DumpWriter
+
+from conftest import make_dummy, table_rows
+
+SCHEMA = '''
+CREATE TABLE parent (id integer PRIMARY KEY, tag text);
+CREATE TABLE child (id integer PRIMARY KEY, pid integer, ptag text);
+'''
+CONFIG = {'tables' : {
+    'parent' : {
+        'id' : {'generator' : 'sequence'},
+        'tag' : {'generator' : 'string', 'pattern' : 'T-###', 'unique' : True},
+    },
+    'child' : {
+        'id' : {'generator' : 'sequence'},
+        'pid' : {'generator' : 'foreign', 'key' : 'parent.id'},
+        'ptag' : {'generator' : 'foreign', 'key' : 'parent.tag'},
+    },
+}}
+
+def existing_dump(tmp_path, numrows):
+    '''
+    a dump of a first run, to seed the next one from
+    '''
+    out = io.StringIO()
+    make_dummy(SCHEMA, CONFIG, seed=1).generate_data(numrows, DumpWriter(out))
+    filename = tmp_path / 'existing.sql'
+    filename.write_text(out.getvalue())
+    return str(filename)
+
+def dump_rows(filename, name):
+    rows = []
+    copying = False
+    for line in open(filename):
+        line = line.rstrip('\n')
+        if line.startswith('COPY {} '.format(name)):
+            copying = True
+        elif line == '\\.':
+            copying = False
+        elif copying:
+            values = line.split('\t')
+            rows.append((int(values[0]), values[1]))
+    return rows
+
+def test_keys_stay_unique_after_seeding(tmp_path):
+    filename = existing_dump(tmp_path, 300)
+    existing = dump_rows(filename, 'parent')
+    assert len(existing) == 300
+
+    dummy = make_dummy(SCHEMA, CONFIG, seed=2)
+    dummy.seed_pools([filename])
+    rows = table_rows(dummy, 300)
+    parents = existing + [(row[0], row[1]) for row in rows['parent']]
+    assert len(set([p[0] for p in parents])) == len(parents)
+    assert len(set([p[1] for p in parents])) == len(parents)
+
+    # foreign keys of the new children point at existing or new parents
+    ids = set([p[0] for p in parents])
+    tags = set([p[1] for p in parents])
+    assert all([row[1] in ids and row[2] in tags for row in rows['child']])
+
+def test_children_of_seeded_parents(tmp_path):
+    filename = existing_dump(tmp_path, 200)
+    existing = dump_rows(filename, 'parent')
+
+    dummy = make_dummy(SCHEMA, CONFIG, seed=2)
+    dummy.seed_pools([filename])
+    rows = table_rows(dummy, 500, tablefilter=['child'])
+    assert list(rows.keys()) == ['child']
+    ids = set([p[0] for p in existing])
+    tags = set([p[1] for p in existing])
+    assert len(rows['child']) == 500
+    assert all([row[1] in ids and row[2] in tags for row in rows['child']])
@@ -0,0 +1,32 @@
+from pgdummy.workload import Workload
+from pgdummy.writers import DirectoryWriter
+
+from conftest import make_dummy, table_rows
+
+SCHEMA = '''
+CREATE TABLE item (id serial PRIMARY KEY, big bigserial, name text);
+'''
+CONFIG = {'tables' : {
+    'item' : {
+        'name' : {'generator' : 'string', 'pattern' : 'N-###'},
+    },
+}}
+
+def test_batched_update_casts_serial_keys():
+    dummy = make_dummy(SCHEMA, CONFIG)
+    table_rows(dummy, 20)
+    workload = Workload(dummy, 'update=100', batch=2)
+    sql = workload.update(workload.tables[0])
+    assert sql.startswith('UPDATE item AS t SET ')
+    assert 't.id = v.id::int4' in sql
+    assert 'serial' not in sql
+
+def test_statements_file_of_a_run(tmp_path):
+    for run in range(2):
+        writer = DirectoryWriter(str(tmp_path))
+        for n in range(3):
+            writer.statements(['DELETE FROM item WHERE id = {};'.format(n)] * 100)
+        writer.finish()
+    text = (tmp_path / 'statements.sql').read_text()
+    assert text.count('SET statement_timeout') == 1
+    assert text.count('DELETE FROM item') == 300